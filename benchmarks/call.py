@@ -0,0 +1,157 @@
+"""
+Measures the per-call cost of plain (unary) remote calls on the client side,
+comparing `microse.rpc.client.RemoteCall` with the former implementation,
+which set up the whole `AwaitableGenerator` machinery for every call.
+
+The client is faked so that only the bookkeeping of the calls is measured,
+each call is resolved as if the server had responded with RETURN.
+
+Usage: `python -m benchmarks.call`
+"""
+from microse.rpc.client import RemoteCall, Task
+from microse.rpc.timer import TimerWheel
+from microse.utils import ChannelEvents, Map, sequid
+import asyncio
+import time
+import tracemalloc
+
+
+class Client:
+    """
+    Stands for `RpcClient`, without the connection.
+    """
+
+    def __init__(self):
+        self.timeout = 5000
+        self.tasks = Map()
+        self.taskId = sequid(0)
+        self.timers = TimerWheel()
+
+    def send(self, *args, conn=0):
+        pass
+
+    def nextConnection(self) -> int:
+        return 0
+
+    def recordLatency(self, latency: float):
+        pass
+
+
+class FormerCall:
+    """
+    The unary path of the former implementation: a queue, a routing `Task`
+    with two closures, another `Task` with two closures, a future and a timer
+    for every call, and the routing task is never released.
+    """
+
+    def __init__(self, client: Client, module: str, method: str, *args):
+        self.state = "pending"
+        self.client = client
+        self.module = module
+        self.method = method
+        self.taskId = next(client.taskId)
+        self.queue = []
+        self.task = self.__prepareTask(ChannelEvents.INVOKE, list(args))
+        self.result = None
+
+    def __await__(self):
+        return self.task.__await__()
+
+    def __createTask(self):
+        def resolve(data):
+            if self.state == "pending" and len(self.queue) > 0:
+                task: Task = self.queue[0]
+                self.queue = self.queue[1:]
+                task.resolve(data)
+
+        def reject(err):
+            if self.state == "pending" and len(self.queue) > 0:
+                task: Task = self.queue[0]
+                self.queue = self.queue[1:]
+                task.reject(err)
+
+        return Task(resolve, reject)
+
+    def __prepareTask(self, event: int, args: list):
+        if not self.client.tasks.get(self.taskId):
+            self.client.tasks.set(self.taskId, self.__createTask())
+
+        def handleTimeout():
+            pass
+
+        timers = self.client.timers
+        timer = timers.add(self.client.timeout, handleTimeout)
+        future = asyncio.get_event_loop().create_future()
+
+        def resolve(data):
+            timers.cancel(timer)
+            future.set_result(data)
+
+        def reject(err):
+            timers.cancel(timer)
+            future.set_exception(err)
+
+        self.queue.append(Task(resolve, reject, event, args and args[0]))
+        self.client.send(event, self.taskId, self.module, self.method, args)
+
+        return future
+
+
+async def measure(cls, number: int):
+    """
+    Returns the average cost (in microseconds) and the number of memory blocks
+    still allocated per call after all the calls have been awaited.
+    """
+    client = Client()
+    calls = []
+    start = time.perf_counter()
+
+    for i in range(number):
+        calls.append(cls(client, "services.detail", "getName", i))
+
+    for call in calls:
+        client.tasks.get(call.taskId).resolve("Mr. World")
+
+    for call in calls:
+        await call
+
+    cost = (time.perf_counter() - start) / number * 1000000
+
+    client = Client()
+    calls = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    for i in range(number):
+        calls.append(cls(client, "services.detail", "getName", i))
+
+    for call in calls:
+        client.tasks.get(call.taskId).resolve("Mr. World")
+
+    for call in calls:
+        await call
+
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats) / number
+    size = sum(stat.size_diff for stat in stats) / number
+
+    return (cost, blocks, size)
+
+
+async def run():
+    number = 50000
+    print(f"{'':>12} {'us/call':>8} {'blocks/call':>12} {'bytes/call':>11}")
+
+    for (name, cls) in [("RemoteCall", RemoteCall), ("former", FormerCall)]:
+        (cost, blocks, size) = await measure(cls, number)
+        print(f"{name:>12} {cost:>8.3f} {blocks:>12.1f} {size:>11.1f}")
+
+
+def main():
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Measures the lookup cost of `microse.utils.Map` with different amount of
+entries, compared with the former list-backed implementation.
+
+Usage: `python -m benchmarks.map`
+"""
+from microse.utils import Map
+import timeit
+
+
+class ListMap:
+    """
+    The former implementation, which stores keys and values in two lists.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.values = []
+
+    def set(self, key, value):
+        self.keys.append(key)
+        self.values.append(value)
+
+    def get(self, key):
+        try:
+            return self.values[self.keys.index(key)]
+        except:
+            return None
+
+    def delete(self, key):
+        try:
+            index = self.keys.index(key)
+            self.keys.pop(index)
+            self.values.pop(index)
+            return True
+        except:
+            return False
+
+
+class Socket:
+    """
+    Stands for a connection, which is hashed by identity.
+    """
+    pass
+
+
+def measure(cls, keys: list, number: int) -> float:
+    """
+    Returns the average cost (in microseconds) of a get-delete-set cycle on
+    the last key, which is the worst case of the list-backed map.
+    """
+    _map = cls()
+
+    for key in keys:
+        _map.set(key, key)
+
+    last = keys[-1]
+
+    def cycle():
+        _map.get(last)
+        _map.delete(last)
+        _map.set(last, last)
+
+    return timeit.timeit(cycle, number=number) / number * 1000000
+
+
+def main():
+    print(f"{'entries':>8} {'key':>8} {'Map (us)':>10} {'ListMap (us)':>13}")
+
+    for size in [100, 1000, 10000, 50000]:
+        # Task ids are sequential integers, connections are plain objects.
+        for (kind, keys) in [("task", list(range(1, size + 1))),
+                             ("socket", [Socket() for _ in range(size)])]:
+            fast = measure(Map, keys, 10000)
+            slow = measure(ListMap, keys, max(10, 1000000 // size))
+            print(f"{size:>8} {kind:>8} {fast:>10.3f} {slow:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
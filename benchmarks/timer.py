@@ -0,0 +1,77 @@
+"""
+Measures the cost of scheduling and canceling call timeouts at high call
+rates, comparing `microse.rpc.timer.TimerWheel` with creating one
+`loop.call_later()` handle per call, which was the former implementation.
+
+Each round schedules a batch of timeouts (the calls sent in one tick) and
+cancels them in the next tick (the responses arrived), while a backlog of
+in-flight calls keeps the timers populated.
+
+Usage: `python -m benchmarks.timer`
+"""
+from microse.rpc.timer import TimerWheel
+import asyncio
+import time
+
+Timeout = 5000
+
+
+def noop():
+    pass
+
+
+class CallLater:
+    """
+    The former implementation, one timer handle of the event loop per call.
+    """
+
+    def add(self, timeout: float, callback):
+        loop = asyncio.get_event_loop()
+        return loop.call_later(timeout / 1000, callback)
+
+    def cancel(self, handle: asyncio.TimerHandle):
+        handle.cancel()
+
+
+async def measure(timers, inflight: int, batch: int, rounds: int) -> float:
+    """
+    Returns the average cost (in microseconds) of scheduling and canceling
+    the timeout of one call.
+    """
+    backlog = [timers.add(Timeout, noop) for _ in range(inflight)]
+    start = time.perf_counter()
+
+    for _ in range(rounds):
+        handles = [timers.add(Timeout, noop) for _ in range(batch)]
+        await asyncio.sleep(0)
+
+        for handle in handles:
+            timers.cancel(handle)
+
+    cost = time.perf_counter() - start
+
+    for handle in backlog:
+        timers.cancel(handle)
+
+    await asyncio.sleep(0)
+    return cost / (batch * rounds) * 1000000
+
+
+async def run():
+    print(f"{'in-flight':>10} {'batch':>6} {'TimerWheel (us)':>16} "
+          f"{'call_later (us)':>16}")
+
+    for inflight in [0, 10000, 100000]:
+        for batch in [10, 1000]:
+            rounds = 50000 // batch
+            fast = await measure(TimerWheel(), inflight, batch, rounds)
+            slow = await measure(CallLater(), inflight, batch, rounds)
+            print(f"{inflight:>10} {batch:>6} {fast:>16.3f} {slow:>16.3f}")
+
+
+def main():
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from microse.proxy import ModuleProxy
 from microse.rpc.server import RpcServer
 from microse.rpc.client import RpcClient
+from microse.routing import getBalancer
 import os
 
 
@@ -19,6 +20,9 @@ class ModuleProxyApp(ModuleProxy):
         self._cache = {}
         self._singletons = {}
         self._remoteSingletons = {}
+        self._routingTables = {}
+        self._balancer = "route"
+        self._balancers = {}
         self._clientOnly = not canServe
         ModuleProxy.__init__(self, name, self)
 
@@ -55,3 +59,29 @@ class ModuleProxyApp(ModuleProxy):
         client = RpcClient(options)
         await client.open()
         return client
+
+    def setBalancer(self, name: str, module: ModuleProxy = None):
+        """
+        Sets the strategy used to pick one of the ready remote instances when
+        a module is served by several servers, for all modules, or only for
+        the given module.
+
+        `setBalancer(name: str)`
+
+        `setBalancer(name: str, module: ModuleProxy)`
+        """
+        if not getBalancer(name):
+            raise ValueError(f"Balancer '{name}' is not supported")
+
+        if module is None:
+            self._balancer = name
+
+            for (modName, table) in self._routingTables.items():
+                if not self._balancers.get(modName):
+                    table.setBalancer(name)
+        else:
+            self._balancers[module.__name__] = name
+            table = self._routingTables.get(module.__name__)
+
+            if table:
+                table.setBalancer(name)
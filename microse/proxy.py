@@ -1,5 +1,5 @@
-from microse.utils import evalRouteId, throwUnavailableError, getInstance
-from importlib import import_module
+from microse.utils import throwUnavailableError, getInstance
+from importlib import import_module, reload
 from inspect import isclass
 from typing import Callable, Any
 
@@ -13,6 +13,8 @@ class ModuleProxy:
         self.__name__ = name
         self._root = root
         self._children = {}
+        self._module = None  # Resolved on first access.
+        self._ctor = None
         root._cache[name] = self
 
     @property
@@ -22,8 +24,10 @@ class ModuleProxy:
         """
         if self._root._clientOnly:
             return None
+        elif self._module is None:
+            self.__load(import_module(self.__name__))
 
-        return import_module(self.__name__)
+        return self._module
 
     @property
     def __ctor__(self) -> Callable:
@@ -33,14 +37,42 @@ class ModuleProxy:
         """
         if self._root._clientOnly:
             return None
+        elif self._module is None:
+            self.__load(import_module(self.__name__))
 
+        return self._ctor
+
+    def __load(self, module):
         _name = self.__name__.split(".")[-1]
-        _class = getattr(self.__module__, _name, None)
+        _class = getattr(module, _name, None)
+        self._ctor = _class if isclass(_class) else None
+        self._module = module
 
-        if isclass(_class):
-            return _class
-        else:
-            return None
+    def invalidate(self):
+        """
+        Forgets the resolved module and class, so that they're resolved again
+        on the next access, e.g. after the module is reloaded elsewhere.
+        """
+        self._module = None
+        self._ctor = None
+
+    def reload(self):
+        """
+        Reloads the module for hot-reload setups, the local singleton created
+        from the old class is discarded, and the next call creates a new one.
+
+        NOTE: `init()` is not called on the new instance, to run the life cycle
+        of a module served by the RPC server, register it again instead.
+        """
+        if self._root._clientOnly:
+            return
+
+        self.__load(reload(import_module(self.__name__)))
+        self._root._singletons.pop(self.__name__, None)
+        server = self._root._server
+
+        if server:
+            server._dropHandlers(self.__name__)
 
     def __getattr__(self, name: str):
         value = self._children.get(name)
@@ -75,22 +107,13 @@ class ModuleProxy:
             if type(route) == str and singletons.get(route):
                 ins = singletons.get(route)
             else:
-                _singletons = []
-
-                for singelton in singletons.values():
-                    if getattr(singelton, "__readyState", 0):
-                        _singletons.append(singelton)
-
-                count = len(_singletons)
-
-                if count == 1:
-                    ins = _singletons[0]
-                elif count >= 2:
-                    # If the module is connected to more than one remote
-                    # instances, redirect traffic to one of them automatically
-                    # according to the route.
-                    id = evalRouteId(route)
-                    ins = _singletons[id % count]
+                # If the module is connected to more than one remote instances,
+                # redirect traffic to one of the ready ones automatically
+                # according to the route. The same route always goes to the
+                # same server in any process, and stays there when other
+                # servers join or leave.
+                table = self._root._routingTables.get(modName)
+                ins = table and table.select(route)
 
             if ins:
                 return getattr(ins, method)(*args)
@@ -0,0 +1,294 @@
+from microse.utils import evalRouteId, rendezvousScore
+from typing import Any, Dict, List, Type
+import random
+
+
+# Routes are mapped onto a fixed number of slots, and each slot is owned by
+# the ready instance with the highest rendezvous score for it, so that picking
+# an instance for a route costs the same regardless of the number of servers.
+SlotCount = 1024
+
+
+def getOutstanding(ins: Any) -> int:
+    """
+    Returns the number of calls sent through the instance's client and not
+    yet responded, including suspended generators.
+    """
+    return ins.client.tasks.size
+
+
+def getWeight(ins: Any) -> int:
+    return max(1, ins.client.weight)
+
+
+def getLatency(ins: Any) -> float:
+    """
+    Returns the moving average of the call latency of the instance's client,
+    or the ping RTT if no call has been responded yet, or `0` if neither has
+    been measured, so that new instances are tried out first.
+    """
+    client = ins.client
+
+    if client.latency is not None:
+        return client.latency
+    else:
+        return client.rtt or 0
+
+
+class Balancer:
+    """
+    The base class of strategies used to pick one of the ready instances of a
+    module for a call. A balancer is created for each routing table, and is
+    notified whenever an instance is added to or removed from the table.
+    """
+
+    name = ""
+
+    def add(self, table: "RoutingTable", serverId: str):
+        pass
+
+    def remove(self, table: "RoutingTable", serverId: str):
+        pass
+
+    def select(self, table: "RoutingTable", route: Any):
+        raise NotImplementedError()
+
+
+class RouteBalancer(Balancer):
+    """
+    Sends the same route (the first argument of the call) to the same server
+    in any process, and only moves the routes of a server when it joins or
+    leaves.
+    """
+
+    name = "route"
+
+    def __init__(self):
+        self.owners: List[str] = [None] * SlotCount
+        self.scores: List[int] = [-1] * SlotCount
+
+    def add(self, table: "RoutingTable", serverId: str):
+        owners = self.owners
+        scores = self.scores
+
+        # The new server only takes over the slots it scores higher.
+        for slot in range(SlotCount):
+            score = rendezvousScore(slot, serverId)
+
+            if score > scores[slot]:
+                owners[slot] = serverId
+                scores[slot] = score
+
+    def remove(self, table: "RoutingTable", serverId: str):
+        owners = self.owners
+        scores = self.scores
+
+        # Only the slots owned by the removed server are reassigned.
+        for slot in range(SlotCount):
+            if owners[slot] != serverId:
+                continue
+
+            owner: str = None
+            best = -1
+
+            for key in table.instances:
+                score = rendezvousScore(slot, key)
+
+                if score > best:
+                    owner = key
+                    best = score
+
+            owners[slot] = owner
+            scores[slot] = best
+
+    def select(self, table: "RoutingTable", route: Any):
+        slot = evalRouteId(route) % SlotCount
+        return table.instances[self.owners[slot]]
+
+
+class LeastOutstandingBalancer(Balancer):
+    """
+    Sends the call to the instance with the fewest outstanding calls.
+    """
+
+    name = "least-outstanding"
+
+    def select(self, table: "RoutingTable", route: Any):
+        return min(table.ready, key=getOutstanding)
+
+
+class PowerOfTwoBalancer(Balancer):
+    """
+    Picks two instances randomly and sends the call to the one with fewer
+    outstanding calls, which is nearly as good as least-outstanding but
+    doesn't scan all the instances.
+    """
+
+    name = "power-of-two"
+
+    def select(self, table: "RoutingTable", route: Any):
+        (ins1, ins2) = random.sample(table.ready, 2)
+
+        if getOutstanding(ins2) < getOutstanding(ins1):
+            return ins2
+        else:
+            return ins1
+
+
+class RoundRobinBalancer(Balancer):
+    """
+    Sends the calls to the instances in turn according to the `weight` of
+    their clients, interleaving the heavier instances with the others (the
+    smooth weighted round-robin).
+    """
+
+    name = "round-robin"
+
+    def __init__(self):
+        self.current: Dict[str, int] = {}
+
+    def add(self, table: "RoutingTable", serverId: str):
+        self.current[serverId] = 0
+
+    def remove(self, table: "RoutingTable", serverId: str):
+        self.current.pop(serverId, None)
+
+    def select(self, table: "RoutingTable", route: Any):
+        current = self.current
+        total = 0
+        best: str = None
+
+        for (serverId, ins) in table.instances.items():
+            weight = getWeight(ins)
+            total += weight
+            current[serverId] += weight
+
+            if best is None or current[serverId] > current[best]:
+                best = serverId
+
+        current[best] -= total
+        return table.instances[best]
+
+
+class LatencyBalancer(Balancer):
+    """
+    Sends the call to the fastest instance, the measured latency is scaled by
+    the outstanding calls, so that the fastest instance doesn't take all the
+    traffic once it slows down under load.
+    """
+
+    name = "latency"
+
+    def select(self, table: "RoutingTable", route: Any):
+        return min(table.ready,
+                   key=lambda ins: getLatency(ins) * (getOutstanding(ins) + 1))
+
+
+balancers: Dict[str, Type[Balancer]] = {}
+
+
+def registerBalancer(balancer: Type[Balancer]):
+    """
+    Registers a balancer class so that it can be selected by its name.
+    """
+    balancers[balancer.name] = balancer
+
+
+def getBalancer(name: str) -> Type[Balancer]:
+    """
+    Returns the balancer class registered by the given name, or `None` if
+    the balancer is not supported.
+    """
+    return balancers.get(name)
+
+
+registerBalancer(RouteBalancer)
+registerBalancer(LeastOutstandingBalancer)
+registerBalancer(PowerOfTwoBalancer)
+registerBalancer(RoundRobinBalancer)
+registerBalancer(LatencyBalancer)
+
+
+class RoutingTable:
+    """
+    Keeps the ready remote instances of a module, the table is updated
+    incrementally when an instance becomes ready or not, instead of being
+    rebuilt on every call.
+    """
+
+    def __init__(self, balancer="route"):
+        self.instances: Dict[str, Any] = {}  # Only the ready instances.
+        self.ready: List[Any] = []
+        self.balancer: Balancer = None
+        self.setBalancer(balancer)
+
+    @property
+    def size(self):
+        return len(self.instances)
+
+    def setBalancer(self, name: str):
+        cls = getBalancer(name)
+
+        if not cls:
+            raise ValueError(f"Balancer '{name}' is not supported")
+
+        self.balancer = cls()
+
+        for serverId in self.instances:
+            self.balancer.add(self, serverId)
+
+    def get(self, serverId: str):
+        return self.instances.get(serverId)
+
+    def update(self, serverId: str, ins: Any):
+        """
+        Adds or removes the instance according to its ready state, or removes
+        the server if `ins` is `None`.
+        """
+        if ins is not None and getattr(ins, "__readyState", 0):
+            self.add(serverId, ins)
+        else:
+            self.remove(serverId)
+
+    def add(self, serverId: str, ins: Any):
+        exists = serverId in self.instances
+        self.instances[serverId] = ins
+        self.ready = list(self.instances.values())
+
+        if not exists:
+            self.balancer.add(self, serverId)
+
+    def remove(self, serverId: str) -> bool:
+        if self.instances.pop(serverId, None) is None:
+            return False
+
+        self.ready = list(self.instances.values())
+        self.balancer.remove(self, serverId)
+        return True
+
+    def select(self, route: Any):
+        """
+        Returns the ready instance that the call goes to, or `None` if no
+        instance is ready.
+        """
+        count = len(self.ready)
+
+        if count == 0:
+            return None
+        elif count == 1:
+            return self.ready[0]
+        else:
+            return self.balancer.select(self, route)
+
+
+def getRoutingTable(root, name: str) -> RoutingTable:
+    """
+    Returns the routing table of the module, creates one if not exists.
+    """
+    table: RoutingTable = root._routingTables.get(name)
+
+    if table is None:
+        table = root._routingTables[name] = RoutingTable(
+            root._balancers.get(name) or root._balancer)
+
+    return table
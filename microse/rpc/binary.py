@@ -0,0 +1,203 @@
+from microse.rpc.codec import Codec
+from microse.utils import ChannelEvents
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+
+# The key of the placeholder that refers to a binary frame in the envelope,
+# e.g. `{"$binary": 0}` refers to the first frame following the envelope. A
+# dict of the data that has this key is escaped as `{"$binary": dict}`.
+BinaryRef = "$binary"
+
+# The maximum number of binary frames following an envelope, a peer sending
+# more is considered misbehaving.
+MaxBinaryFrames = 1024
+
+# The events whose last element is a payload that may carry binary data.
+PayloadEvents = [ChannelEvents.INVOKE,
+                 ChannelEvents.RETURN,
+                 ChannelEvents.THROW,
+                 ChannelEvents.YIELD,
+                 ChannelEvents.PUBLISH]
+
+
+def isBuffer(obj: Any) -> bool:
+    """
+    Checks if the object is binary data that is sent as a sidecar frame, that
+    is, `bytes`, `bytearray`, `memoryview` or a NumPy array (or any other array
+    exporting the buffer protocol via `__array_interface__`).
+    """
+    return isinstance(obj, (bytes, bytearray, memoryview)) \
+        or hasattr(obj, "__array_interface__")
+
+
+def toFrame(obj: Any) -> Union[bytes, memoryview]:
+    """
+    Returns a flat view of the binary data that can be sent as a frame without
+    copying it, only non-contiguous arrays are copied.
+    """
+    if type(obj) == bytes:
+        return obj
+
+    view = memoryview(obj)
+
+    if view.ndim == 1 and view.format == "B" and view.c_contiguous:
+        return view
+
+    try:
+        return view.cast("B")
+    except TypeError:  # not C-contiguous
+        return view.tobytes()
+
+
+def extractBuffers(data: Any, buffers: list) -> Any:
+    """
+    Replaces the binary data found in the payload with placeholders and
+    appends them to `buffers`, returns the payload itself if there is none.
+    """
+    _type = type(data)
+
+    if _type in (str, int, float, bool) or data is None:
+        return data
+    elif _type in (list, tuple):
+        items = None
+
+        for (i, item) in enumerate(data):
+            _item = extractBuffers(item, buffers)
+
+            if _item is not item:
+                if items is None:
+                    items = list(data)
+
+                items[i] = _item
+
+        return data if items is None else items
+    elif _type == dict:
+        _dict = None
+
+        for (key, value) in data.items():
+            _value = extractBuffers(value, buffers)
+
+            if _value is not value:
+                if _dict is None:
+                    _dict = dict(data)
+
+                _dict[key] = _value
+
+        if BinaryRef in data:  # escape
+            return {BinaryRef: data if _dict is None else _dict}
+        else:
+            return data if _dict is None else _dict
+    elif isBuffer(data):
+        buffers.append(toFrame(data))
+        return {BinaryRef: len(buffers) - 1}
+    else:
+        return data
+
+
+def restoreBuffers(data: Any, buffers: List[bytes]) -> Any:
+    """
+    Replaces the placeholders in the payload with the binary frames received
+    after the envelope, in place.
+    """
+    _type = type(data)
+
+    if _type == list:
+        for (i, item) in enumerate(data):
+            data[i] = restoreBuffers(item, buffers)
+    elif _type == dict:
+        ref = data.get(BinaryRef)
+
+        if len(data) == 1 and type(ref) == int:
+            if 0 <= ref < len(buffers):
+                return buffers[ref]
+            else:
+                raise ValueError(f"Binary frame {ref} is missing")
+        elif len(data) == 1 and type(ref) == dict:  # escaped
+            data = ref
+
+        for key in data:
+            data[key] = restoreBuffers(data[key], buffers)
+
+    return data
+
+
+def encodeMessage(codec: Codec, msg: list, binary: bool
+                  ) -> Tuple[Union[str, bytes], List[memoryview]]:
+    """
+    Encodes the message, if `binary` is on (the peer supports the `binary`
+    feature), the binary data in the payload is taken out and returned along
+    with the envelope, which are sent as raw binary frames after it.
+
+    The envelope of such message is `[BINARY, count, msg]`, where `count` is
+    the number of the binary frames that follow it.
+    """
+    buffers: List[memoryview] = []
+
+    if binary and len(msg) >= 3 and msg[0] in PayloadEvents:
+        data = extractBuffers(msg[-1], buffers)
+
+        if buffers:
+            msg = [ChannelEvents.BINARY, len(buffers), msg[:-1] + [data]]
+
+    return (codec.encode(msg), buffers)
+
+
+def isEnvelope(msg: Any) -> bool:
+    """
+    Checks if the decoded message is the envelope of a message carrying
+    binary frames.
+    """
+    return type(msg) == list and len(msg) == 3 \
+        and msg[0] == ChannelEvents.BINARY and type(msg[1]) == int \
+        and type(msg[2]) == list and len(msg[2]) > 0
+
+
+def checkEnvelope(msg: list):
+    """
+    Checks the number of binary frames declared by the envelope before they're
+    read, raises `ValueError` if it's invalid, in which case the connection
+    should be closed.
+    """
+    if not 0 < msg[1] <= MaxBinaryFrames:
+        raise ValueError(f"Invalid number of binary frames: {msg[1]}")
+
+
+def openEnvelope(msg: list, buffers: List[bytes]) -> list:
+    """
+    Restores the message carried by the envelope with the binary frames
+    received after it.
+    """
+    _msg: list = msg[2]
+    _msg[-1] = restoreBuffers(_msg[-1], buffers)
+    return _msg
+
+
+async def readEnvelope(socket, msg: list, onError: Callable) -> Optional[list]:
+    """
+    Reads the binary frames following the envelope from the socket and returns
+    the message restored with them. If the envelope or the frames are invalid,
+    the error is passed to `onError`, the connection is closed and `None` is
+    returned.
+    """
+    buffers: List[bytes] = []
+
+    try:
+        checkEnvelope(msg)
+
+        for _ in range(msg[1]):
+            buf = await socket.recv()
+
+            if type(buf) != bytes:
+                raise TypeError("Expected a binary frame")
+
+            buffers.append(buf)
+
+        return openEnvelope(msg, buffers)
+    except Exception as err:
+        if not socket.closed:
+            onError(err)
+            # The following frames cannot be told apart anymore.
+            # 1002: protocol error
+            await socket.close(1002, "invalid binary frames")
+
+        return None
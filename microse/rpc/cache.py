@@ -0,0 +1,147 @@
+from collections import OrderedDict
+from inspect import isasyncgenfunction
+from microse.rpc.binary import extractBuffers, restoreBuffers
+from microse.rpc.codec import Codec
+from microse.utils import JSON
+from typing import Any, Callable, Tuple, Union
+from weakref import WeakSet
+import time
+
+
+# The reserved topic that the server publishes to invalidate the cached
+# results of the clients, the data is a dict of `module`, `method` and `args`,
+# `method` and `args` are optional.
+InvalidationTopic = "microse:invalidate"
+
+
+def cacheable(ttl: int = 60000, maxEntries: int = 1000) -> Callable:
+    """
+    Marks a method of a service whose result can be cached for the given
+    arguments, `ttl` is the lifetime of the result in milliseconds, and
+    `maxEntries` is the maximum number of results kept for the method, the
+    least recently used ones are evicted first.
+
+    The results are cached by the clients, and memoized by the server as
+    well. Only methods that return a single result can be cached, the mark is
+    ignored on async generator functions.
+    """
+    def decorate(fn: Callable) -> Callable:
+        if not isasyncgenfunction(fn):
+            fn.__cacheable__ = {"ttl": ttl, "maxEntries": maxEntries}
+            fn.__caches__ = WeakSet()  # The caches of the servers.
+
+        return fn
+
+    return decorate
+
+
+def getCacheOptions(fn: Callable) -> dict:
+    """
+    Returns the options that the method is marked with by `cacheable`, or
+    `None` if the method isn't cacheable.
+    """
+    return getattr(fn, "__cacheable__", None)
+
+
+def getCacheKey(args: list) -> str:
+    """
+    Encodes the arguments as the key of the result, or returns `None` if they
+    cannot be encoded.
+    """
+    try:
+        return JSON.stringify(list(args))
+    except Exception:
+        return None
+
+
+def invalidate(fn: Callable, *args):
+    """
+    Discards the results of the cacheable method memoized by the servers in
+    the current process, or only the one for the given arguments. This is
+    meant to be called by the service code once the data changes, e.g.
+    `invalidate(self.getReport, year)`, use `RpcServer.invalidateCache()` to
+    reach the clients and the other workers as well.
+    """
+    key = getCacheKey(args) if args else None
+
+    for cache in list(getattr(fn, "__caches__", None) or []):
+        if key is None:
+            cache.clear()
+        else:
+            cache.delete(key)
+
+
+def encodeResult(codec: Codec, value: Any) -> Tuple[Union[str, bytes], list]:
+    """
+    Encodes a result to be cached, the binary data in it is kept aside as is,
+    see `decodeResult()`.
+    """
+    buffers: list = []
+    return (codec.encode(extractBuffers(value, buffers)), buffers)
+
+
+def decodeResult(codec: Codec, entry: Tuple[Union[str, bytes], list]) -> Any:
+    """
+    Decodes a cached result for a caller, so that each caller gets its own
+    copy, and modifying it doesn't affect the cache and the other callers.
+    """
+    (data, buffers) = entry
+    return restoreBuffers(codec.decode(data), buffers)
+
+
+class ResultCache:
+    """
+    Caches the results of a method keyed by the encoded arguments, entries
+    expire after `ttl` milliseconds, and the least recently used ones are
+    evicted once there are more than `maxEntries` of them.
+    """
+
+    def __init__(self, ttl: int = 60000, maxEntries: int = 1000):
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+        self.hits = 0
+        self.misses = 0
+        # Incremented by every invalidation, so that the result of a call
+        # started before it isn't stored afterwards.
+        self.generation = 0
+        self.__entries: OrderedDict = OrderedDict()
+
+    @property
+    def size(self) -> int:
+        return len(self.__entries)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry: Tuple[float, Any] = self.__entries.get(key)
+
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return (True, entry[1])
+
+            del self.__entries[key]
+
+        self.misses += 1
+        return (False, None)
+
+    def set(self, key: str, value: Any):
+        self.__entries[key] = (time.monotonic() + self.ttl / 1000, value)
+        self.__entries.move_to_end(key)
+
+        while len(self.__entries) > self.maxEntries:
+            self.__entries.popitem(last=False)
+
+    def delete(self, key: str) -> bool:
+        self.generation += 1
+        return self.__entries.pop(key, None) is not None
+
+    def clear(self):
+        self.generation += 1
+        self.__entries.clear()
+
+    def getStats(self) -> dict:
+        return {
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
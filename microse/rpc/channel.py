@@ -1,11 +1,17 @@
 from urllib.parse import urlparse, parse_qs
 from asyncio.futures import Future
+from microse.rpc.codec import getCodec
 from typing import Callable
 import asyncio
 import sys
 import os
 
 
+# The maximum number of values a remote generator pushes ahead per `PULL`
+# request, larger credits granted by the client are clamped to it.
+MaxCredits = 256
+
+
 def print_err(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
@@ -24,6 +30,9 @@ class RpcChannel:
         self.secret = ""
         self.codec = "JSON"
         self.ssl = None
+        self.compression: bool = None  # Depends on the protocol by default.
+        self.compressionThreshold = 1024
+        self.compressionLevel = -1  # The default level of zlib.
         self.onError(print_err)
 
         if type(options) == int:
@@ -38,6 +47,11 @@ class RpcChannel:
             self.secret = options.get("secret") or self.secret
             self.codec = options.get("codec") or self.codec
             self.ssl = options.get("ssl") or self.ssl
+            self.compression = options.get("compression", self.compression)
+            self.compressionThreshold = options.get(
+                "compressionThreshold", self.compressionThreshold)
+            self.compressionLevel = options.get(
+                "compressionLevel", self.compressionLevel)
         elif type(options) == str:
             url = str(options)
             isAbsPath = url[0] == "/"
@@ -59,7 +73,7 @@ class RpcChannel:
             self.secret = str(query.get("secret")
                               and query.get("secret")[0] or self.secret)
             self.codec = str(query.get("codec")
-                             and query.get("secret")[0] or self.codec)
+                             and query.get("codec")[0] or self.codec)
 
             if isUnixSocket:
                 self.hostname = ""
@@ -81,10 +95,15 @@ class RpcChannel:
 
         isUnixSocket = self.protocol == "ws+unix:"
 
+        # Compressing messages over a Unix socket only burns CPU.
+        if self.compression is None:
+            self.compression = not isUnixSocket
+
         if isUnixSocket and sys.platform == "win32":
             raise Exception("IPC on Windows is currently not supported")
-        elif self.codec != "JSON":
-            raise Exception("Only 'JSON' is supported by this implementation")
+        elif not getCodec(self.codec):
+            raise Exception(
+                f"Codec '{self.codec}' is not supported by this implementation")
         elif self.protocol == "wss:" and not self.ssl:
             raise Exception("'ssl' must be provided for 'wss:' protocol")
 
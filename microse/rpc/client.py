@@ -1,9 +1,19 @@
 from websockets import connect, unix_connect
 from websockets.exceptions import ConnectionClosedOK
-from typing import Callable, Any, List
-from microse.rpc.channel import RpcChannel
-from microse.utils import sequid, randStr, JSON, Map, ChannelEvents, now, parseError, throwUnavailableError, getInstance
+from typing import Callable, Any, Dict, List, Tuple
+from microse.rpc.channel import MaxCredits, RpcChannel
+from microse.rpc.binary import encodeMessage, isEnvelope, readEnvelope
+from microse.rpc.cache import InvalidationTopic, ResultCache, decodeResult, encodeResult, getCacheKey, getCacheOptions
+from microse.rpc.codec import Codec, getCodec
+from microse.rpc.compression import getClientExtensions
+from microse.rpc.outbox import Outbox
+from microse.rpc.timer import TimerWheel
+from microse.utils import sequid, randStr, Map, ChannelEvents, parseError, throwUnavailableError, getInstance, movingAverage
 from microse.proxy import ModuleProxy
+from microse.routing import getRoutingTable
+from collections import deque
+from inspect import iscoroutinefunction
+from typing import Deque
 import asyncio
 
 
@@ -13,6 +23,16 @@ ResolvableEvents = [ChannelEvents.RETURN,
                     ChannelEvents.YIELD]
 
 
+def getOptions(res: list) -> dict:
+    """
+    Returns the options carried by the CONNECT message.
+    """
+    if len(res) >= 3 and type(res[2]) == dict:
+        return res[2]
+    else:
+        return {}
+
+
 class RpcClient(RpcChannel):
     def __init__(self, options, host=""):
         RpcChannel.__init__(self, options, host)
@@ -24,11 +44,38 @@ class RpcClient(RpcChannel):
         self.socket = None
         self.registry = {}
         self.topics = Map()
-        self.tasks = Map()  # Stores the all suspended generator calls.
+        self.tasks = Map()  # Stores the all pending and suspended calls.
         self.taskId = sequid(0)
+        self.timers = TimerWheel()  # Shared by the timeouts of all calls.
+        self.topicFilter = False
+        self.prefetch = 0
+        self.weight = 1
+        self.connections = 1
+        self.coalesce = False
+        self.coalesced = 0  # The number of calls that joined another one.
+        self.rtt: float = None  # The moving average of the ping RTT in ms.
+        self.latency: float = None  # The moving average of call latency.
+        self.__codec: Codec = getCodec("JSON")
+        self.__features: List[str] = []
+        self.__featureSets: List[List[str]] = []  # One for each connection.
+        self.__outboxes: List[Outbox] = []  # One for each connection.
+        self.__connIndex = 0
+        self.__ping: Tuple[int, float] = None  # The id and time of the ping.
+        self.__pingTimer: asyncio.TimerHandle = None
+        self.__caches: Dict[Tuple[str, str], ResultCache] = {}
+        # The futures of the callers of the unary calls in flight, keyed by
+        # the module, the method and the encoded arguments, for coalescing
+        # identical calls.
+        self.inflight: Dict[Tuple[str, str, str], List[asyncio.Future]] = {}
 
         if type(options) == dict:
             self.timeout = options.get("timeout") or self.timeout
+            self.topicFilter = options.get("topicFilter") or self.topicFilter
+            self.prefetch = min(options.get("prefetch") or self.prefetch,
+                                MaxCredits)
+            self.weight = options.get("weight") or self.weight
+            self.connections = options.get("connections") or self.connections
+            self.coalesce = options.get("coalesce") or self.coalesce
             self.serverId = options.get("serverId") or self.serverId
             self.pingTimeout = options.get("pingTimeout") or self.pingTimeout
             self.pingInterval = options.get(
@@ -66,62 +113,154 @@ class RpcClient(RpcChannel):
                             self.serverId + " after closing the channel")
 
         self.state = "connecting"
+        features: List[str] = ["batch", "binary"]
+
+        if self.topicFilter:
+            features.append("topics")
+
+        if self.prefetch > 0:
+            features.append("pull")
+
+        self.socket = await self.__connect(features)
+        res = await self.__handshake(self.socket)
+
+        if res is None:
+            # Protocol error, shall close the channel.
+            await self.socket.close()
+            raise Exception("Cannot connect to " + self.serverId)
+
+        self.__codec = getCodec(getOptions(res).get("codec")) \
+            or getCodec("JSON")
+        self.__features = getOptions(res).get("features") or []
+        sockets = [self.socket]
+        featureSets = [self.__features]
+
+        # The extra connections only carry calls, they declare to filter
+        # topics and never subscribe any, so the server doesn't publish to
+        # them.
+        if "topics" not in features:
+            features = features + ["topics"]
+
+        try:
+            for _ in range(self.connections - 1):
+                socket = await self.__connect(features)
+                sockets.append(socket)
+                _res = await self.__handshake(socket)
+
+                if _res is None:
+                    raise Exception("Cannot connect to " + self.serverId)
+
+                featureSets.append(getOptions(_res).get("features") or [])
+        except Exception as err:
+            for socket in sockets:
+                await socket.close()
+
+            raise err
+
+        for outbox in self.__outboxes:
+            outbox.close()
+
+        self.__featureSets = featureSets
+        self.__outboxes = [Outbox(socket, self.__codec, "batch" in _features,
+                                  self.handleError,
+                                  binary="binary" in _features)
+                           for (socket, _features) in zip(sockets, featureSets)]
+        self.state = "connected"
+        self.__updateServerId(str(res[1]))
+
+        for outbox in self.__outboxes:
+            asyncio.create_task(self.__listenMessage(outbox.socket))
+
+        self.__sendPing()
+
+        # Invalidations may have been missed while disconnected.
+        for cache in self.__caches.values():
+            cache.clear()
+
+        # The server forgets the topics when the connection is lost, so
+        # register them again whenever the connection is established.
+        for topic in self.topics.keys():
+            self.__notifyTopic(ChannelEvents.SUBSCRIBE, topic)
+
+        self.resume()
+
+    async def __connect(self, features: List[str]):
         ping_timeout = self.pingTimeout / 1000
         ping_interval = self.pingInterval / 1000
         url: str
 
         if self.protocol == "ws+unix:":
-            url = "ws://localhost?id=" + self.id
+            url = "ws://localhost?id=" + self.id + "&codec=" + self.codec
+
+            url += "&features=" + ",".join(features)
 
             if self.secret:
                 url += "&secret=" + self.secret
 
-            self.socket = await unix_connect(self.pathname, url, ssl=self.ssl,
-                                             ping_interval=ping_interval,
-                                             ping_timeout=ping_timeout)
+            return await unix_connect(self.pathname, url, ssl=self.ssl,
+                                      ping_interval=ping_interval,
+                                      ping_timeout=ping_timeout,
+                                      compression=None,
+                                      extensions=getClientExtensions(self))
         else:
             url = self.protocol + "//" + self.hostname + \
-                ":" + str(self.port) + self.pathname + "?id=" + self.id
+                ":" + str(self.port) + self.pathname + "?id=" + self.id + \
+                "&codec=" + self.codec
+
+            url += "&features=" + ",".join(features)
 
             if self.secret:
                 url += "&secret=" + self.secret
 
-            self.socket = await connect(url, ssl=self.ssl,
-                                        ping_interval=ping_interval,
-                                        ping_timeout=ping_timeout)
+            return await connect(url, ssl=self.ssl,
+                                 ping_interval=ping_interval,
+                                 ping_timeout=ping_timeout,
+                                 compression=None,
+                                 extensions=getClientExtensions(self))
 
-        # Accept the first message for handshake.
-        msg = await self.socket.recv()
-        res = self.__parseResponse(msg)
+    async def __handshake(self, socket) -> list:
+        """
+        Accepts the first message for handshake, which is always encoded in
+        JSON and carries the codec negotiated for the further messages, returns
+        `None` if the message is not a CONNECT event.
+        """
+        msg = await socket.recv()
+        res: list = None
+
+        try:
+            res = getCodec("JSON").decode(msg)
+        except Exception as err:
+            self.handleError(err)
 
         if type(res) != list or len(res) < 2 or res[0] != ChannelEvents.CONNECT:
-            # Protocol error, shall close the channel.
-            self.close()
-            raise Exception("Cannot connect to " + self.serverId)
+            return None
         else:
-            self.state = "connected"
-            self.__updateServerId(str(res[1]))
-            asyncio.create_task(self.__listenMessage())
-            self.resume()
+            return res
 
     def __updateServerId(self, serverId: str):
         if serverId != self.serverId:
             for name in self.registry:
                 mod: ModuleProxy = self.registry[name]
-                singletons = mod._root._remoteSingletons
+                singletons = mod._root._remoteSingletons.get(name)
 
-                if singletons.get(self.serverId):
+                if singletons and singletons.get(self.serverId):
                     singletons[serverId] = singletons[self.serverId]
                     singletons.pop(self.serverId)
+                    table = getRoutingTable(mod._root, name)
+                    table.remove(self.serverId)
+                    table.update(serverId, singletons[serverId])
 
             self.serverId = serverId
 
-    async def __listenMessage(self):
+    async def __listenMessage(self, socket):
+        # Only the primary connection receives published messages.
+        primary = socket is self.socket
+
         while True:
             msg: Any = None
 
             try:
-                msg = await self.socket.recv()
+                msg = await socket.recv()
             except ConnectionClosedOK:
                 pass
             except ConnectionError:
@@ -129,27 +268,35 @@ class RpcClient(RpcChannel):
             except Exception as err:
                 self.handleError(err)
 
-            if self.socket.closed or self.closed:
+            if socket.closed or self.closed:
                 # Handle disconnection asynchronously.
-                asyncio.create_task(self.__handleDisconnection())
+                asyncio.create_task(self.__handleDisconnection(socket))
                 break
 
-            # Process the message asynchronously.
-            asyncio.create_task(self.__handleMessage(msg))
+            res = self.__parseResponse(msg)
+
+            # The binary frames of the message follow it immediately.
+            if isEnvelope(res):
+                res = await readEnvelope(socket, res, self.handleError)
+
+            # Process the messages asynchronously.
+            if type(res) == list and len(res) > 0 and type(res[0]) == list:
+                for _res in res:  # batch frame
+                    asyncio.create_task(self.__handleMessage(_res, primary))
+            else:
+                asyncio.create_task(self.__handleMessage(res, primary))
 
     def __parseResponse(self, msg: Any) -> list:
-        if type(msg) != str:
+        if type(msg) not in (str, bytes):
             return
 
         try:
-            return JSON.parse(msg)
+            return self.__codec.decode(msg)
         except Exception as err:
             self.handleError(err)
 
-    async def __handleMessage(self, msg: Any):
-        res = self.__parseResponse(msg)
-
-        if type(res) != list or type(res[0]) != int:
+    async def __handleMessage(self, res: list, primary=True):
+        if type(res) != list or len(res) < 2 or type(res[0]) != int:
             return
 
         event: int = res[0]
@@ -174,7 +321,12 @@ class RpcClient(RpcChannel):
             if task:
                 task.reject(parseError(data))
 
-        elif event == ChannelEvents.PUBLISH:
+        elif event == ChannelEvents.PONG:
+            if self.__ping and self.__ping[0] == taskId:
+                self.recordRtt((loop.time() - self.__ping[1]) * 1000)
+                self.__ping = None
+
+        elif event == ChannelEvents.PUBLISH and primary:
             # If receives the PUBLISH event, call all the handlers
             # bound to the corresponding topic.
             handlers: List[Callable] = self.topics.get(str(taskId))
@@ -190,11 +342,17 @@ class RpcClient(RpcChannel):
                     except Exception as err:
                         self.handleError(err)
 
-    async def __handleDisconnection(self):
-        # If the socket is closed or reset. but the channel remains open, pause
-        # the service immediately and try to reconnect.
+    async def __handleDisconnection(self, socket):
+        # The sockets of a previous connection have been taken care of.
+        if not any(outbox.socket is socket for outbox in self.__outboxes):
+            return
+
+        # If any socket is closed or reset. but the channel remains open,
+        # pause the service immediately and try to reconnect all the sockets.
         if not self.connecting and not self.closed:
             self.pause()
+            self.state = "connecting"
+            await self.__closeSockets()
             await self.__reconnect()
 
     async def __reconnect(self):
@@ -210,12 +368,66 @@ class RpcClient(RpcChannel):
             else:
                 await asyncio.sleep(2)
 
-    def send(self, *args):
-        if self.socket and self.socket.open:
-            data = list(args)
+    def __sendPing(self):
+        """
+        Sends a PING to the server on every `pingInterval` to measure the
+        round-trip time, a ping that is not answered until the next one
+        counts as a sample of the whole interval.
+        """
+        if self.__pingTimer:
+            self.__pingTimer.cancel()
+            self.__pingTimer = None
+
+        if not self.connected:
+            self.__ping = None
+            return
+        elif self.__ping:
+            self.recordRtt((loop.time() - self.__ping[1]) * 1000)
+
+        self.__ping = (next(self.taskId), loop.time())
+        self.send(ChannelEvents.PING, self.__ping[0])
+        self.__pingTimer = loop.call_later(self.pingInterval / 1000,
+                                           self.__sendPing)
+
+    def recordRtt(self, rtt: float):
+        self.rtt = movingAverage(self.rtt, rtt)
 
-            if self.codec == "JSON":
-                asyncio.create_task(self.socket.send(JSON.stringify(data)))
+    def recordLatency(self, latency: float):
+        self.latency = movingAverage(self.latency, latency)
+
+    def send(self, *args, conn=0):
+        """
+        Sends a message via the connection of the given index, the primary
+        connection by default.
+        """
+        if conn < len(self.__outboxes):
+            outbox = self.__outboxes[conn]
+
+            if outbox.socket.open:
+                (msg, buffers) = encodeMessage(self.__codec, list(args),
+                                               outbox.binary)
+                outbox.push(msg, buffers=buffers)
+
+    def hasFeature(self, name: str, conn=0) -> bool:
+        """
+        Checks if the server has agreed to use the feature on the connection
+        of the given index, the primary connection by default.
+        """
+        return conn < len(self.__featureSets) \
+            and name in self.__featureSets[conn]
+
+    def nextConnection(self) -> int:
+        """
+        Returns the index of the connection that the next call goes through,
+        the calls are spread across the connections in turn.
+        """
+        count = len(self.__outboxes)
+
+        if count <= 1:
+            return 0
+
+        self.__connIndex = (self.__connIndex + 1) % count
+        return self.__connIndex
 
     def subscribe(self, topic: str, handle: Callable):
         """
@@ -223,9 +435,11 @@ class RpcClient(RpcChannel):
         """
         handlers: List[Callable] = self.topics.get(topic)
 
-        if handlers is None:
-            handlers = [handle]
-            self.topics.set(topic, handlers)
+        if not handlers:
+            # The first handler of the topic, register the topic on the
+            # server.
+            self.topics.set(topic, [handle])
+            self.__notifyTopic(ChannelEvents.SUBSCRIBE, topic)
         else:
             handlers.append(handle)
 
@@ -237,7 +451,9 @@ class RpcClient(RpcChannel):
         topic.
         """
         if handle is None:
-            return self.topics.delete(topic)
+            if self.topics.delete(topic):
+                self.__notifyTopic(ChannelEvents.UNSUBSCRIBE, topic)
+                return True
         else:
             handlers: List[Callable] = self.topics.get(topic)
 
@@ -245,18 +461,86 @@ class RpcClient(RpcChannel):
                 try:
                     i = handlers.index(handle)
                     handlers.pop(i)
+
+                    # Drop the topic along with its last handler, so it's
+                    # registered again when subscribed later, and is not
+                    # registered when reconnecting.
+                    if not handlers:
+                        self.topics.delete(topic)
+                        self.__notifyTopic(ChannelEvents.UNSUBSCRIBE, topic)
+
                     return True
                 except:
                     pass
 
         return False
 
+    def setCache(self, module: str, method: str, ttl: int = 60000,
+                 maxEntries: int = 1000):
+        """
+        Caches the results of the remote method for the given arguments, see
+        `microse.rpc.cache.cacheable()` for the options. Methods marked by
+        `cacheable` are cached automatically, this method is meant for
+        client-only apps, which don't load the classes.
+        """
+        self.__caches[(module, method)] = ResultCache(ttl, maxEntries)
+
+        if self.topics.get(InvalidationTopic) is None:
+            self.subscribe(InvalidationTopic, self.__handleInvalidation)
+
+    def getCache(self, module: str, method: str) -> ResultCache:
+        return self.__caches.get((module, method))
+
+    def getCacheStats(self) -> List[dict]:
+        """
+        Returns the statistics of the result caches, each item contains the
+        `module` and `method` name, the number of entries (`size`), `hits` and
+        `misses`.
+        """
+        stats: List[dict] = []
+
+        for ((module, method), cache) in self.__caches.items():
+            item = cache.getStats()
+            item.update({"module": module, "method": method})
+            stats.append(item)
+
+        return stats
+
+    def invalidateCache(self, module: str, method: str = None,
+                        args: list = None):
+        """
+        Discards the cached results of the module, or only of the method, or
+        only the one for the given arguments.
+        """
+        for ((_module, _method), cache) in self.__caches.items():
+            if _module != module or (method and _method != method):
+                continue
+            elif args is None:
+                cache.clear()
+            else:
+                key = getCacheKey(args)
+                cache.delete(key) if key else cache.clear()
+
+    def __handleInvalidation(self, data: Any):
+        if type(data) == dict and data.get("module"):
+            self.invalidateCache(data.get("module"), data.get("method"),
+                                 data.get("args"))
+
+    def __notifyTopic(self, event: int, topic: str):
+        # Only notify the server if it has agreed to filter topics for the
+        # client.
+        if "topics" in self.__features:
+            self.send(event, topic)
+
     async def close(self):
         self.state = "closed"
         self.pause()
 
-        if self.socket:
-            await self.socket.close()
+        if self.__pingTimer:
+            self.__pingTimer.cancel()
+            self.__pingTimer = None
+
+        await self.__closeSockets()
 
         for name in self.registry:
             mod = self.registry[name]
@@ -264,6 +548,17 @@ class RpcClient(RpcChannel):
 
             if singletons and singletons.get(self.serverId):
                 singletons.pop(self.serverId)
+                getRoutingTable(mod._root, name).remove(self.serverId)
+
+    async def __closeSockets(self):
+        for outbox in self.__outboxes:
+            outbox.close()
+
+            if outbox.socket is not self.socket:
+                await outbox.socket.close()
+
+        if self.socket:
+            await self.socket.close()
 
     def pause(self):
         """
@@ -292,13 +587,19 @@ class RpcClient(RpcChannel):
             else:
                 setattr(singletons[self.serverId], "__readyState", 0)
 
+            getRoutingTable(mod._root, mod.__name__).update(
+                self.serverId, singletons[self.serverId])
+
     def __flushReadyState(self, state: int):
         for name in self.registry:
             mod: ModuleProxy = self.registry.get(name)
             singletons = mod._root._remoteSingletons.get(mod.__name__)
 
             if singletons and singletons.get(self.serverId):
-                setattr(singletons.get(self.serverId), "__readyState", state)
+                ins = singletons.get(self.serverId)
+                setattr(ins, "__readyState", state)
+                getRoutingTable(mod._root, mod.__name__).update(
+                    self.serverId, ins)
 
     def __createRemoteInstance(self, mod: ModuleProxy):
         return RpcInstance(mod, self)
@@ -320,6 +621,11 @@ class RpcInstance:
             if ctor and not callable(method):
                 return None
 
+            # Without the class, a method is only known to be unary if its
+            # results are cached. A plain function may return an async
+            # iterator, so only coroutine functions are known to be unary.
+            unary = bool(ctor) and iscoroutinefunction(method)
+
             def bound(*args):
                 if ctor:
                     server: RpcChannel = mod._root and mod._root._server
@@ -340,15 +646,111 @@ class RpcInstance:
                     if not self.client.connected:
                         throwUnavailableError(mod.__name__)
 
-                return AwaitableGenerator(self.client,
-                                          mod.__name__, prop, *args)
+                cache = self.client.getCache(mod.__name__, prop)
+
+                if cache or (unary and self.client.coalesce):
+                    return callByKey(self.client, mod.__name__, prop, args,
+                                     cache)
+
+                return RemoteCall(self.client, mod.__name__, prop, *args)
 
             self.props[prop] = bound
             bound.__name__ = ctor and method.__name__ or prop
+            options = ctor and getCacheOptions(method)
+
+            if options and not self.client.getCache(mod.__name__, prop):
+                self.client.setCache(mod.__name__, prop, **options)
 
         return self.props.get(prop)
 
 
+def callByKey(client: RpcClient, module: str, method: str, args: tuple,
+              cache: ResultCache = None):
+    """
+    Calls a unary remote method, looking up the result cache and joining an
+    identical call in flight (if `coalesce` is on) before sending a request.
+    """
+    key = getCacheKey(args)
+
+    if key is None:
+        # The arguments cannot be used as a key.
+        return RemoteCall(client, module, method, *args)
+
+    # The results are cached encoded, so that each hit decodes its own copy.
+    codec = getCodec(client.codec)
+
+    if cache:
+        (hit, entry) = cache.get(key)
+
+        if hit:
+            future = loop.create_future()
+            future.set_result(decodeResult(codec, entry))
+            return future
+
+    if client.coalesce:
+        waiters = client.inflight.get((module, method, key))
+
+        # Each caller waits via its own future, so that one cancelling its
+        # wait doesn't cancel the others.
+        if waiters is not None:
+            client.coalesced += 1
+            waiter = loop.create_future()
+            waiters.append(waiter)
+            return waiter
+
+    call = RemoteCall(client, module, method, *args)
+    generation = cache and cache.generation
+    waiters: List[asyncio.Future] = []
+
+    def settle(future: asyncio.Future):
+        if client.inflight.get((module, method, key)) is waiters:
+            client.inflight.pop((module, method, key))
+
+        if future.cancelled():
+            for waiter in waiters:
+                waiter.cancel()
+
+            return
+        elif future.exception() is not None:
+            for waiter in waiters:
+                waiter.done() or waiter.set_exception(future.exception())
+
+            return
+
+        result = future.result()
+        entry = None
+
+        # Like the cache hits, the callers that joined the call get their own
+        # copy of the result.
+        if call.generator is None and (cache or len(waiters) > 1):
+            try:
+                entry = encodeResult(codec, result)
+            except Exception:
+                # The result cannot be encoded, it's neither cached nor copied.
+                pass
+
+        if cache and entry and generation == cache.generation:
+            cache.set(key, entry)
+
+        for (i, waiter) in enumerate(waiters):
+            if waiter.done():
+                continue
+            elif i == 0 or entry is None:
+                waiter.set_result(result)
+            else:
+                waiter.set_result(decodeResult(codec, entry))
+
+    call.future.add_done_callback(settle)
+
+    if client.coalesce:
+        client.inflight[(module, method, key)] = waiters
+        waiter = loop.create_future()
+        waiters.append(waiter)
+        return waiter
+
+    return call
+
+
 class Task:
     def __init__(self, resolve: Callable, reject: Callable, event=0, data=None):
         self.resolve = resolve
@@ -357,45 +759,154 @@ class Task:
         self.data = data
 
 
-class AwaitableGenerator:
+class RemoteCall:
+    """
+    The object returned by calling a remote method. A plain call only holds a
+    future that is resolved by the response directly, the generator protocol
+    is set up on demand once the call is iterated, which is the case when the
+    remote method returns an async generator (the server replies INVOKE).
+    """
+
+    __slots__ = ("client", "module", "method", "taskId", "future", "timer",
+                 "generator", "startTime", "conn")
+
     def __init__(self, client: RpcClient, module: str, method: str, *args):
-        self.state = "pending"
         self.client = client
         self.module = module
         self.method = method
         self.taskId = next(client.taskId)
+        self.future = loop.create_future()
+        self.generator: AwaitableGenerator = None
+        self.startTime = loop.time()
+        self.conn = client.nextConnection()
+
+        # Initiate the task immediately when the remote method is called, it
+        # will either be awaited as a promise or iterated as a iterator.
+        client.tasks.set(self.taskId, self)
+        self.timer = client.timers.add(client.timeout, self.__handleTimeout)
+        client.send(ChannelEvents.INVOKE, self.taskId, module, method,
+                    list(args), conn=self.conn)
+
+    def __await__(self):  # support 'await'
+        return self.future.__await__()
+
+    __iter__ = __await__  # make compatible with 'yield from'.
+
+    def __aiter__(self):  # support `async for`
+        return self.__iterate()
+
+    def __anext__(self):  # support `async for`
+        return self.__iterate().__anext__()
+
+    def asend(self, value: Any):
+        return self.__iterate().asend(value)
+
+    def athrow(self, type: Callable, message: str = None, traceback=None):
+        return self.__iterate().athrow(type, message, traceback)
+
+    def aclose(self):
+        return self.__iterate().aclose()
+
+    def resolve(self, data: Any):
+        if not self.future.done():
+            self.client.recordLatency((loop.time() - self.startTime) * 1000)
+
+        self.__settle()
+        self.future.done() or self.future.set_result(data)
+
+    def reject(self, err: Exception):
+        self.__settle()
+        self.future.done() or self.future.set_exception(err)
+
+    def __settle(self):
+        self.client.timers.cancel(self.timer)
+
+        # Once upgraded, the task id is taken over by the generator.
+        if self.client.tasks.get(self.taskId) is self:
+            self.client.tasks.delete(self.taskId)
+
+    def __handleTimeout(self):
+        callee = self.module + "." + self.method + "()"
+        duration = str(self.client.timeout / 1000) + "s"
+
+        # A server that doesn't respond in time is regarded as slow.
+        self.client.recordLatency(self.client.timeout)
+        self.reject(TimeoutError(callee + " timeout after " + duration))
+
+    def __iterate(self):
+        if self.generator is None:
+            self.generator = AwaitableGenerator(self)
+
+        return self.generator
+
+
+class AwaitableGenerator:
+    def __init__(self, call: RemoteCall):
+        self.state = "pending"
+        self.client = call.client
+        self.module = call.module
+        self.method = call.method
+        self.taskId = call.taskId
+        self.conn = call.conn  # Pinned to the connection of the call.
+        self.result = None
 
         # Generators calls will be queued in a sequence so that when the server
         # yield a value (which is sequential), the client can process them
-        # properly. For regular calls, the queue's size is fixed to 1.
+        # properly.
         self.queue = []
 
-        # Initiate the task immediately when the remote method is called, this
-        # operation will create an individual task, it will either be awaited as
-        # a promise or iterated as a iterator.
-        self.task = self.__invokeTask(ChannelEvents.INVOKE, *args)
-        self.result = None
+        # When prefetch is enabled, iterating the generator via `async for`
+        # lets the server push the yielded values ahead into the buffer,
+        # `credits` is the number of values the server has been granted to
+        # push but not yet arrived. Only servers that support the `pull`
+        # feature can push values ahead, otherwise values are pulled one by
+        # one.
+        if self.client.hasFeature("pull", self.conn):
+            self.prefetch = self.client.prefetch
+        else:
+            self.prefetch = 0
 
-    def __await__(self):  # support 'await'
-        if not self.task.done():
-            yield from self.task
+        self.buffer: Deque[Any] = deque()
+        self.credits = 0
+        self.__waiter: asyncio.Future = None
 
-        if not self.task.done():
-            raise RuntimeError("await wasn't used with future")  # required
-        else:
-            self.result = self.task.result()
-            return self.result
+        future = call.future
 
-    __iter__ = __await__  # make compatible with 'yield from'.
+        if future.done() and (future.cancelled() or future.exception()):
+            # The remote method has failed, there is nothing to iterate.
+            self.state = "closed"
+            return
+
+        self.client.tasks.set(self.taskId, self.__createTask())
+
+        # The iteration may start before the response of INVOKE arrives, queue
+        # it ahead of the generator calls.
+        if not future.done():
+            self.client.timers.cancel(call.timer)
+            self.__queueTask(ChannelEvents.INVOKE, None, future)
 
     def __aiter__(self):  # support `async for`
         return self
 
     async def __anext__(self):  # support `async for`
-        return await self.asend(None)
+        if self.prefetch > 0:
+            return await self.__pull()
+        else:
+            return await self.asend(None)
 
     async def asend(self, value: Any):
-        if self.state == "closed":
+        # A generator driven by `asend()` may receive values at any step, so
+        # no more values are pulled ahead once it's called.
+        self.prefetch = 0
+        await self.__settle()
+
+        if self.buffer:
+            if value is None:
+                return self.__shift()
+            else:
+                raise RuntimeError(
+                    "Cannot send a value while prefetched values are pending")
+        elif self.state == "closed":
             raise StopAsyncIteration()
 
         try:
@@ -411,6 +922,9 @@ class AwaitableGenerator:
             raise err
 
     async def athrow(self, type: Callable, message: str = None, traceback=None):
+        await self.__settle()
+        self.buffer.clear()
+
         if self.state == "closed":
             return
 
@@ -435,6 +949,9 @@ class AwaitableGenerator:
             raise err
 
     async def aclose(self):
+        await self.__settle()
+        self.buffer.clear()
+
         if self.state == "closed":
             return
 
@@ -452,11 +969,83 @@ class AwaitableGenerator:
             self.__close()
             raise err
 
+    async def __pull(self):
+        prefetch = self.prefetch
+
+        # Grant new credits when the server has fulfilled the previous ones
+        # and half of the buffered values have been consumed, so the next
+        # values are on the way while the rest are being consumed.
+        if self.state == "pending" and self.credits == 0 \
+                and len(self.buffer) <= prefetch // 2:
+            self.credits = prefetch - len(self.buffer)
+            self.client.send(ChannelEvents.PULL, self.taskId,
+                             self.module, self.method, [self.credits],
+                             conn=self.conn)
+
+        while not self.buffer:
+            if self.state == "closed":
+                raise StopAsyncIteration()
+
+            await self.__wait()
+
+        return self.__shift()
+
+    def __shift(self):
+        res = self.buffer.popleft()
+
+        if isinstance(res, Exception):
+            raise res
+        elif res.get("done") is True:
+            raise StopAsyncIteration()
+        else:
+            return res.get("value")
+
+    async def __settle(self):
+        """
+        Waits until the server has pushed all the values it's been granted,
+        so that the generator can be operated in lock-step.
+        """
+        while self.credits > 0 and self.state == "pending":
+            await self.__wait()
+
+    async def __wait(self):
+        def handleTimeout():
+            callee = self.module + "." + self.method + "()"
+            duration = str(self.client.timeout / 1000) + "s"
+            self.__receive(TimeoutError(callee + " timeout after " + duration))
+            self.__close()
+
+        self.__waiter = loop.create_future()
+        timer = self.client.timers.add(self.client.timeout, handleTimeout)
+
+        try:
+            await self.__waiter
+        finally:
+            self.client.timers.cancel(timer)
+
+    def __receive(self, res: Any):
+        """
+        Receives a value pushed by the server.
+        """
+        if isinstance(res, Exception) or res.get("done") is True:
+            self.credits = 0
+        else:
+            self.credits -= 1
+
+        self.buffer.append(res)
+        self.__wake()
+
+    def __wake(self):
+        if self.__waiter and not self.__waiter.done():
+            self.__waiter.set_result(None)
+
     def __close(self, result: Any = None):
         if self.state != "closed":
             self.result = result
             self.state = "closed"
+            self.credits = 0
             self.client.tasks.delete(self.taskId)
+            self.__wake()
 
             # Stop all pending tasks
             task: Task
@@ -477,6 +1066,11 @@ class AwaitableGenerator:
                     task: Task = self.queue[0]
                     self.queue = self.queue[1:]
                     task.resolve(data)
+                elif self.credits > 0:
+                    self.__receive(data)
+
+                    if data.get("done") is True:
+                        self.__close()
 
         def reject(err):
             if self.state == "pending":
@@ -484,43 +1078,51 @@ class AwaitableGenerator:
                     task: Task = self.queue[0]
                     self.queue = self.queue[1:]
                     task.reject(err)
+                elif self.credits > 0:
+                    self.__receive(err)
 
                 self.__close()
 
         return Task(resolve, reject)
 
-    def __prepareTask(self, event: int, args: List[Any]):
-        if not self.client.tasks.get(self.taskId):
-            self.client.tasks.set(self.taskId, self.__createTask())
-
+    def __queueTask(self, event: int, data: Any,
+                    future: asyncio.Future = None) -> asyncio.Future:
         def handleTimeout():
             if len(self.queue) > 0:
                 task: Task = self.queue[0]
-                self.task = self.queue[1:]
+                self.queue = self.queue[1:]
                 callee = self.module + "." + self.method + "()"
                 duration = str(self.client.timeout / 1000) + "s"
                 err = TimeoutError(callee + " timeout after " + duration)
                 task.reject(err)
 
-        timeout = loop.call_later(self.client.timeout / 1000, handleTimeout)
-        future = loop.create_future()
-        genData = None
+        timers = self.client.timers
+        timer = timers.add(self.client.timeout, handleTimeout)
 
-        if len(args) > 0:
-            genData = args[0]
+        if future is None:
+            future = loop.create_future()
 
         def resolve(data):
-            timeout.cancelled() or timeout.cancel()
-            future.set_result(data)
+            timers.cancel(timer)
+            future.done() or future.set_result(data)
 
         def reject(err):
-            timeout.cancelled() or timeout.cancel()
-            future.set_exception(err)
+            timers.cancel(timer)
+            future.done() or future.set_exception(err)
+
+        self.queue.append(Task(resolve, reject, event, data))
+
+        return future
+
+    def __prepareTask(self, event: int, args: List[Any]):
+        genData = None
+
+        if len(args) > 0:
+            genData = args[0]
 
-        task = Task(resolve, reject, event, genData)
-        self.queue.append(task)
+        future = self.__queueTask(event, genData)
         self.client.send(event, self.taskId,
-                         self.module, self.method, args)
+                         self.module, self.method, args, conn=self.conn)
 
         return future
 
@@ -531,9 +1133,7 @@ class AwaitableGenerator:
             data = args[0]
 
         if self.state == "closed":
-            if event == ChannelEvents.INVOKE:
-                return self.result
-            elif event == ChannelEvents.YIELD:
+            if event == ChannelEvents.YIELD:
                 return None
             elif event == ChannelEvents.RETURN:
                 return data
@@ -0,0 +1,148 @@
+from abc import ABC, abstractmethod
+from microse.utils import JSON
+from typing import Any, Dict, List, Union
+
+
+class Codec(ABC):
+    """
+    The base class of codecs used to encode and decode messages transmitted
+    through the RPC channel.
+    """
+
+    name = ""
+
+    # Whether the encoded messages are sent as binary frames.
+    binary = False
+
+    @abstractmethod
+    def encode(self, data: Any) -> Union[str, bytes]:
+        pass
+
+    @abstractmethod
+    def decode(self, msg: Union[str, bytes]) -> Any:
+        pass
+
+    def join(self, msgs: List[Union[str, bytes]]) -> Union[str, bytes]:
+        """
+        Packs several encoded messages into one encoded array without decoding
+        them, returns `None` if the codec doesn't support it.
+        """
+        return None
+
+
+class JSONCodec(Codec):
+    name = "JSON"
+
+    def encode(self, data: Any) -> str:
+        return JSON.stringify(data)
+
+    def decode(self, msg: Union[str, bytes]) -> Any:
+        return JSON.parse(msg)
+
+    def join(self, msgs: List[str]) -> str:
+        return "[" + ",".join(msgs) + "]"
+
+
+def toSerializable(obj):
+    """
+    Converts an object that the binary codecs don't recognize to a builtin
+    type, the same way `JSONSerializable` does.
+    """
+    if hasattr(obj, "toJSON"):
+        return obj.toJSON()
+    elif hasattr(obj, "__json__"):
+        return obj.__json__
+    elif hasattr(obj, "__dict__"):
+        _dict = {}
+
+        for key in obj.__dict__:
+            if key[0:2] != "__":
+                _dict[key] = obj.__dict__[key]
+
+        return _dict
+    else:
+        raise TypeError(
+            f"Object of type {type(obj).__name__} is not serializable")
+
+
+codecs: Dict[str, Codec] = {}
+
+
+def registerCodec(codec: Codec):
+    """
+    Registers a codec so that it can be used by the RPC channels.
+    """
+    codecs[codec.name] = codec
+
+
+def getCodec(name: str) -> Codec:
+    """
+    Returns the codec registered by the given name, or `None` if the codec is
+    not supported.
+    """
+    return codecs.get(name)
+
+
+registerCodec(JSONCodec())
+
+try:
+    import msgpack
+
+    class MessagePackCodec(Codec):
+        name = "MSGPACK"
+        binary = True
+
+        def encode(self, data: Any) -> bytes:
+            return msgpack.packb(data, default=toSerializable,
+                                 use_bin_type=True)
+
+        def decode(self, msg: Union[str, bytes]) -> Any:
+            return msgpack.unpackb(msg, raw=False, strict_map_key=False)
+
+        def join(self, msgs: List[bytes]) -> bytes:
+            count = len(msgs)
+
+            if count < 0x10:
+                header = bytes([0x90 | count])
+            elif count < 0x10000:
+                header = b"\xdc" + count.to_bytes(2, "big")
+            else:
+                header = b"\xdd" + count.to_bytes(4, "big")
+
+            return header + b"".join(msgs)
+
+    registerCodec(MessagePackCodec())
+except ImportError:
+    pass
+
+try:
+    import cbor2
+
+    class CBORCodec(Codec):
+        name = "CBOR"
+        binary = True
+
+        def encode(self, data: Any) -> bytes:
+            return cbor2.dumps(data, default=lambda encoder, obj:
+                               encoder.encode(toSerializable(obj)))
+
+        def decode(self, msg: Union[str, bytes]) -> Any:
+            return cbor2.loads(msg)
+
+        def join(self, msgs: List[bytes]) -> bytes:
+            count = len(msgs)
+
+            if count < 24:
+                header = bytes([0x80 | count])
+            elif count < 0x100:
+                header = b"\x98" + count.to_bytes(1, "big")
+            elif count < 0x10000:
+                header = b"\x99" + count.to_bytes(2, "big")
+            else:
+                header = b"\x9a" + count.to_bytes(4, "big")
+
+            return header + b"".join(msgs)
+
+    registerCodec(CBORCodec())
+except ImportError:
+    pass
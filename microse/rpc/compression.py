@@ -0,0 +1,94 @@
+from websockets.extensions.base import Extension
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory, PerMessageDeflate, ServerPerMessageDeflateFactory
+from websockets.frames import CTRL_OPCODES, OP_CONT, Frame
+from typing import List, Optional
+
+
+class ThresholdDeflate(Extension):
+    """
+    Wraps the negotiated per-message deflate extension, messages smaller than
+    the threshold are sent uncompressed (which the extension allows), since
+    compressing them costs more CPU than it saves bandwidth. Incoming messages
+    are decoded as usual.
+    """
+
+    name = PerMessageDeflate.name
+
+    def __init__(self, deflate: PerMessageDeflate, threshold: int):
+        self.deflate = deflate
+        self.threshold = threshold
+        # Whether the message being sent is left uncompressed, which applies to
+        # its continuation frames as well.
+        self.skipping = False
+
+    def __repr__(self) -> str:
+        return f"ThresholdDeflate({self.deflate!r}, threshold={self.threshold})"
+
+    def decode(self, frame: Frame, *, max_size: Optional[int] = None) -> Frame:
+        return self.deflate.decode(frame, max_size=max_size)
+
+    def encode(self, frame: Frame) -> Frame:
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+        elif frame.opcode is not OP_CONT:
+            self.skipping = len(frame.data) < self.threshold
+
+        # A skipped message doesn't go through the compressor, so the shared
+        # window of both peers remains in sync.
+        return frame if self.skipping else self.deflate.encode(frame)
+
+
+def getCompressSettings(level: int) -> dict:
+    # The same memory level as the defaults of websockets.
+    return {"memLevel": 5, "level": level}
+
+
+class ServerDeflateFactory(ServerPerMessageDeflateFactory):
+    def __init__(self, threshold: int, level: int):
+        ServerPerMessageDeflateFactory.__init__(
+            self,
+            server_max_window_bits=12,
+            client_max_window_bits=12,
+            compress_settings=getCompressSettings(level))
+        self.threshold = threshold
+
+    def process_request_params(self, params, accepted_extensions):
+        (response, deflate) = ServerPerMessageDeflateFactory\
+            .process_request_params(self, params, accepted_extensions)
+        return (response, ThresholdDeflate(deflate, self.threshold))
+
+
+class ClientDeflateFactory(ClientPerMessageDeflateFactory):
+    def __init__(self, threshold: int, level: int):
+        ClientPerMessageDeflateFactory.__init__(
+            self, compress_settings=getCompressSettings(level))
+        self.threshold = threshold
+
+    def process_response_params(self, params, accepted_extensions):
+        deflate = ClientPerMessageDeflateFactory\
+            .process_response_params(self, params, accepted_extensions)
+        return ThresholdDeflate(deflate, self.threshold)
+
+
+def getServerExtensions(channel) -> List[ServerDeflateFactory]:
+    """
+    Returns the extensions offered by the server according to the compression
+    options of the channel, or `None` if compression is disabled.
+    """
+    if channel.compression:
+        return [ServerDeflateFactory(channel.compressionThreshold,
+                                     channel.compressionLevel)]
+    else:
+        return None
+
+
+def getClientExtensions(channel) -> List[ClientDeflateFactory]:
+    """
+    Returns the extensions requested by the client according to the
+    compression options of the channel, or `None` if compression is disabled.
+    """
+    if channel.compression:
+        return [ClientDeflateFactory(channel.compressionThreshold,
+                                     channel.compressionLevel)]
+    else:
+        return None
@@ -0,0 +1,181 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from microse.rpc.codec import getCodec
+from multiprocessing import get_context
+from importlib import import_module
+from inspect import isclass, iscoroutinefunction, isasyncgenfunction
+from typing import Any, Callable, Dict, Set, Union
+import asyncio
+import threading
+
+
+def runInProcess(fn: Callable) -> Callable:
+    """
+    Marks the method of a service to run in the process pool of the server,
+    so that a CPU-bound computation doesn't stall the event loop.
+
+    The method is called on a separate instance of the class in the pool
+    process, which is created without calling `init()`, so it should only
+    depend on its arguments. The arguments and the result are passed via the
+    codec of the channel.
+    """
+    fn.__executor__ = "process"
+    return fn
+
+
+# The executors that a method may run in.
+# - `loop` runs the method on the event loop.
+# - `thread` runs a plain method in the thread pool of the server.
+# - `process` runs the method in the process pool of the server.
+Executors = ["loop", "thread", "process"]
+
+
+def runInThread(fn: Callable) -> Callable:
+    """
+    Marks a plain (non-coroutine) method of a service to run in the thread
+    pool of the server, so that blocking I/O doesn't stall the event loop.
+    """
+    fn.__executor__ = "thread"
+    return fn
+
+
+def getExecutor(fn: Callable) -> str:
+    """
+    Returns the name of the executor that the method is marked to run in, or
+    `None` if the method runs on the event loop.
+    """
+    return getattr(fn, "__executor__", None)
+
+
+def resolveExecutor(fn: Callable, policy: str = None) -> str:
+    """
+    Returns the executor that the method runs in according to its mark, or
+    the policy of its module. Only plain methods are moved off the event loop
+    by the policy, and coroutine functions are never run in the thread pool.
+    """
+    executor = getExecutor(fn)
+
+    if executor == "process":
+        return executor
+    elif iscoroutinefunction(fn) or isasyncgenfunction(fn):
+        return "loop"
+    else:
+        return executor or policy or "loop"
+
+
+class Pool:
+    """
+    Wraps an executor and keeps track of the tasks submitted to it, the tasks
+    beyond the size of the pool are waiting in its queue.
+    """
+
+    def __init__(self, executor: Executor, size: int):
+        self.executor = executor
+        self.size = size
+        self.pending = 0  # The tasks submitted and not yet finished.
+        self.completed = 0
+        self.futures: Set[Future] = set()
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.pending - self.size)
+
+    async def run(self, fn: Callable, *args) -> Any:
+        future = self.executor.submit(fn, *args)
+        self.futures.add(future)
+        self.pending += 1
+
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            self.futures.discard(future)
+            self.pending -= 1
+            self.completed += 1
+
+    def getStats(self) -> dict:
+        return {
+            "size": self.size,
+            "pending": self.pending,
+            "queued": self.queued,
+            "completed": self.completed
+        }
+
+    def shutdown(self, wait=False):
+        # Cancel the queued tasks, only the running ones are waited for.
+        # `cancel_futures` of `shutdown()` requires Python 3.9.
+        for future in list(self.futures):
+            future.cancel()
+
+        self.executor.shutdown(wait=wait)
+
+    async def close(self):
+        """
+        Shuts down the pool and waits for the running tasks in a separate
+        thread, so that the event loop isn't blocked meanwhile.
+        """
+        # Polled instead of being notified via `call_soon_threadsafe()` (or
+        # `run_in_executor()`), since the wakeup pipe of a loop inherited by
+        # fork is shared with the parent process.
+        thread = threading.Thread(target=self.shutdown, args=(True,),
+                                  daemon=True)
+        thread.start()
+
+        while thread.is_alive():
+            await asyncio.sleep(0.05)
+
+
+class MethodStats:
+    """
+    The statistics of the remote calls of a method, the time is the total
+    duration of the calls in milliseconds.
+    """
+
+    def __init__(self, executor: str):
+        self.executor = executor
+        self.calls = 0
+        self.pending = 0
+        self.errors = 0
+        self.time = 0.0
+
+
+def createThreadPool(size: int) -> Pool:
+    return Pool(ThreadPoolExecutor(size), size)
+
+
+def createProcessPool(size: int) -> Pool:
+    # Spawn fresh processes instead of forking the running event loop, which
+    # re-import the `__main__` module of the program.
+    executor = ProcessPoolExecutor(size, mp_context=get_context("spawn"))
+    return Pool(executor, size)
+
+
+# The instances of the modules created in the pool process.
+instances: Dict[str, Any] = {}
+
+
+def getProcessInstance(module: str):
+    ins = instances.get(module)
+
+    if ins is None:
+        mod = import_module(module)
+        _class = getattr(mod, module.split(".")[-1], None)
+        ins = instances[module] = _class() if isclass(_class) else mod
+
+    return ins
+
+
+def invokeInProcess(codecName: str, module: str, method: str,
+                    payload: Union[str, bytes]) -> Union[str, bytes]:
+    """
+    Calls the method in the pool process, the arguments and the result are
+    encoded by the codec.
+    """
+    codec = getCodec(codecName)
+    args: list = codec.decode(payload)
+    res = getattr(getProcessInstance(module), method)(*args)
+
+    if asyncio.iscoroutine(res):
+        res = asyncio.run(res)
+    elif hasattr(res, "__aiter__"):
+        raise TypeError(f"{module}.{method}() cannot run in process pool")
+
+    return codec.encode(res)
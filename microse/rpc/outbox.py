@@ -0,0 +1,224 @@
+from microse.rpc.codec import Codec
+from collections import deque
+from typing import Callable, Deque, List, Tuple, Union
+import asyncio
+
+
+# The maximum size of a batch frame, messages will be split into several
+# frames if they exceed this size, so that the peer won't reject the frame for
+# being too large.
+MaxBatchSize = 64 * 1024
+
+# The policies applied when the queued data exceeds the high water mark.
+# - `pause` stops reading messages from the peer until the queue drains.
+# - `drop` discards droppable messages (e.g. PUBLISH) until the queue drains.
+# - `close` closes the connection.
+OverflowPolicies = ["pause", "drop", "close"]
+
+
+class Outbox:
+    """
+    Queues the outgoing messages of a socket and sends them sequentially in a
+    single writer coroutine. Messages queued in the same tick of the event
+    loop are packed into one batch frame if the peer supports it.
+
+    If `highWaterMark` is set, the outbox turns into overflowed state once the
+    queued data exceeds it, and recovers after the data drops to
+    `lowWaterMark`, `policy` decides what to do in the meantime.
+    """
+
+    def __init__(self, socket, codec: Codec, batch=False,
+                 onError: Callable = None, highWaterMark=0, lowWaterMark=0,
+                 policy="pause", binary=False):
+        self.socket = socket
+        self.codec = codec
+        self.batch = batch
+        self.binary = binary  # Whether the peer accepts binary frames.
+        self.closed = False
+        # A message carrying binary frames is queued along with them.
+        self.queue: Deque[Union[str, bytes, tuple]] = deque()
+        self.size = 0  # The size of the queued and not yet sent messages.
+        self.dropped = 0
+        self.overflowed = False
+        self.highWaterMark = highWaterMark
+        self.lowWaterMark = min(lowWaterMark, highWaterMark)
+        self.policy = policy
+        self.__onError = onError
+        self.__waiter: asyncio.Future = None
+        self.__drainer: asyncio.Future = None
+        self.__writer = asyncio.create_task(self.__write())
+
+    @property
+    def buffered(self) -> int:
+        """
+        The size of the data written to the transport but not yet flushed.
+        """
+        transport = getattr(self.socket, "transport", None)
+
+        if transport:
+            return transport.get_write_buffer_size()
+        else:
+            return 0
+
+    def push(self, msg: Union[str, bytes], droppable=False,
+             buffers: List[memoryview] = None) -> bool:
+        """
+        Queues an encoded message to be sent, returns `False` if the message
+        is discarded. `buffers` are the binary frames sent right after the
+        message, see `encodeMessage()`.
+        """
+        if self.closed:
+            return False
+        elif droppable and self.overflowed and self.policy == "drop":
+            self.dropped += 1
+            return False
+
+        if buffers:
+            self.queue.append((msg, buffers))
+            self.size += len(msg) + sum(len(buf) for buf in buffers)
+        else:
+            self.queue.append(msg)
+            self.size += len(msg)
+
+        if self.__waiter and not self.__waiter.done():
+            self.__waiter.set_result(None)
+
+        if self.highWaterMark and not self.overflowed \
+                and self.size > self.highWaterMark:
+            self.overflowed = True
+
+            if self.policy == "close":
+                # 1013: try again later
+                asyncio.create_task(self.socket.close(1013, "overflowed"))
+                self.close()
+
+        return True
+
+    async def drain(self):
+        """
+        Waits until the outbox recovers from the overflowed state.
+        """
+        if self.overflowed and not self.closed:
+            if not self.__drainer:
+                self.__drainer = asyncio.get_event_loop().create_future()
+
+            await self.__drainer
+
+    def close(self):
+        """
+        Stops the writer and discards the pending messages.
+        """
+        if not self.closed:
+            self.closed = True
+            self.queue.clear()
+            self.size = 0
+
+            if self.__waiter and not self.__waiter.done():
+                self.__waiter.set_result(None)
+
+            self.__resume()
+
+    def __resume(self):
+        self.overflowed = False
+
+        if self.__drainer:
+            self.__drainer.done() or self.__drainer.set_result(None)
+            self.__drainer = None
+
+    def __pack(self) -> List[Tuple[Union[str, bytes, list], int]]:
+        """
+        Takes all queued messages out and packs them into frames, returns the
+        frames along with their sizes.
+        """
+        queue = self.queue
+        frames: List[Tuple[Union[str, bytes, list], int]] = []
+
+        if not self.batch or len(queue) == 1:
+            while queue:
+                msg = queue.popleft()
+
+                if type(msg) == tuple:
+                    self.__unpack(msg, frames)
+                else:
+                    frames.append((msg, len(msg)))
+
+            return frames
+
+        batch: List[Union[str, bytes]] = []
+        size = 0
+
+        while queue:
+            msg = queue.popleft()
+
+            if type(msg) == tuple:
+                # The binary frames must follow their envelope immediately, so
+                # the envelope is never packed into a batch.
+                if batch:
+                    frames.append((self.__join(batch), size))
+                    batch = []
+                    size = 0
+
+                self.__unpack(msg, frames)
+                continue
+
+            if batch and size + len(msg) > MaxBatchSize:
+                frames.append((self.__join(batch), size))
+                batch = []
+                size = 0
+
+            batch.append(msg)
+            size += len(msg)
+
+        if batch:
+            frames.append((self.__join(batch), size))
+
+        return frames
+
+    def __unpack(self, item: tuple,
+                 frames: List[Tuple[Union[str, bytes, list], int]]):
+        (msg, buffers) = item
+        frames.append((msg, len(msg)))
+
+        for buf in buffers:
+            frames.append((buf, len(buf)))
+
+    def __join(self, batch: List[Union[str, bytes]]):
+        if len(batch) == 1:
+            return batch[0]
+        else:
+            return self.codec.join(batch) or batch
+
+    async def __write(self):
+        loop = asyncio.get_event_loop()
+
+        while not self.closed:
+            if not self.queue:
+                # The waiter is resolved when a message is queued, the writer
+                # resumes after the other callbacks of the current tick, which
+                # may queue more messages as well.
+                self.__waiter = loop.create_future()
+                await self.__waiter
+                self.__waiter = None
+                continue
+
+            try:
+                for (frame, size) in self.__pack():
+                    # `send()` waits for the transport to flush its buffer if
+                    # the buffer exceeds the websocket's write limit, so the
+                    # data piles up in the queue when the peer is slow.
+                    if type(frame) == list:
+                        # The codec doesn't support batch, send one by one.
+                        for msg in frame:
+                            await self.socket.send(msg)
+                    else:
+                        await self.socket.send(frame)
+
+                    self.size = max(0, self.size - size)
+
+                    if self.overflowed and self.size <= self.lowWaterMark:
+                        self.__resume()
+            except Exception as err:
+                self.close()
+
+                if self.socket.open and self.__onError:
+                    self.__onError(err)
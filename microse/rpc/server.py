@@ -1,18 +1,98 @@
 from websockets import WebSocketServer, WebSocketServerProtocol as WebSocket, serve, unix_serve
-from websockets.exceptions import ConnectionClosedOK, ConnectionClosedError
-from typing import Any, AsyncGenerator, List
+from websockets.exceptions import ConnectionClosedOK
+from typing import Any, AsyncGenerator, Callable, Dict, List, Set, Tuple
 from urllib.parse import parse_qs
-from microse.rpc.channel import RpcChannel
-from microse.utils import JSON, Map, ChannelEvents, now, parseError, throwUnavailableError, tryLifeCycleFunction, getInstance
+from microse.rpc.channel import MaxCredits, RpcChannel
+from microse.rpc.binary import encodeMessage, isEnvelope, readEnvelope
+from microse.rpc.cache import InvalidationTopic, ResultCache, getCacheKey, getCacheOptions
+from microse.rpc.codec import Codec, getCodec
+from microse.rpc.compression import getServerExtensions
+from microse.rpc.outbox import Outbox, OverflowPolicies
+from microse.rpc.executor import Executors, MethodStats, Pool, createProcessPool, createThreadPool, invokeInProcess, resolveExecutor
+from microse.utils import JSON, Map, OverloadError, ChannelEvents, parseError, throwUnavailableError, tryLifeCycleFunction, getInstance
 from microse.proxy import ModuleProxy
+from inspect import isasyncgenfunction, iscoroutinefunction
+from multiprocessing import get_context
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from socket import socket as Socket, AF_UNIX, SOCK_STREAM
 import asyncio
 import http
 import os
+import sys
 
 
 GeneratorEvents = [ChannelEvents.YIELD,
                    ChannelEvents.RETURN,
-                   ChannelEvents.THROW]
+                   ChannelEvents.THROW,
+                   ChannelEvents.PULL]
+RequestEvents = [ChannelEvents.INVOKE] + GeneratorEvents
+OverloadPolicies = ["pause", "reject"]
+
+# The protocol extensions that the server supports, a client declares the
+# extensions it wants via the `features` query parameter when connecting.
+# - `batch` the peer accepts frames that carry an array of messages.
+# - `topics` the client registers its topics so that the server only publishes
+#   subscribed topics to it.
+# - `binary` the peer accepts binary data carried by raw binary frames that
+#   follow the message, see `encodeMessage()`.
+# - `pull` the client may send `PULL` requests to let a remote generator push
+#   its values ahead, up to `MaxCredits` per request.
+Features = ["batch", "topics", "binary", "pull"]
+
+# The seconds to wait for the workers to exit after being told to close, the
+# ones still alive are terminated afterwards.
+WorkerExitTimeout = 10
+
+
+class Worker:
+    """
+    A worker process forked by the server, along with the pipe to it and the
+    IDs of the clients connected to it.
+    """
+
+    def __init__(self, process: BaseProcess, conn: Connection):
+        self.process = process
+        self.conn = conn
+        self.clients: List[str] = []
+
+    def send(self, msg: tuple) -> bool:
+        try:
+            self.conn.send(msg)
+            return True
+        except Exception:
+            return False
+
+
+class Handler:
+    """
+    The dispatch entry of a method of a registered module, which is resolved
+    once and knows the kind of the method (`coroutine`, `asyncgen` or
+    `function`) and the executor it runs in.
+    """
+
+    def __init__(self, ins: Any, fn: Callable, executor: str,
+                 stats: MethodStats):
+        self.ins = ins  # The instance (or the module) that owns the method.
+        self.fn = fn
+        self.executor = executor
+        self.stats = stats
+        self.cache: ResultCache = None  # Only for the cacheable methods.
+        # The futures of the calls being processed, keyed by the encoded
+        # arguments, so that concurrent misses wait for the same call.
+        self.inflight: Dict[str, asyncio.Future] = {}
+        options = getCacheOptions(fn)
+
+        if options:
+            self.cache = ResultCache(**options)
+            fn.__caches__.add(self.cache)
+
+        if isasyncgenfunction(fn):
+            self.kind = "asyncgen"
+        elif iscoroutinefunction(fn):
+            self.kind = "coroutine"
+        else:
+            self.kind = "function"
 
 
 class RpcServer(RpcChannel):
@@ -23,12 +103,65 @@ class RpcServer(RpcChannel):
         self.registry = dict()
         self.clients = Map()
         self.tasks = Map()
+        self.outboxes = Map()
+        self.topics: Dict[str, Set[WebSocket]] = {}
+        self.subscriptions = Map()  # Stores topics of the filtering clients.
+        self.wildcards: Set[WebSocket] = set()  # Clients receive all topics.
         self.proxyRoot = None
+        self.highWaterMark = 16 * 1024 * 1024
+        self.lowWaterMark: int = None  # Half of highWaterMark by default.
+        self.overflowPolicy = "pause"
+        self.maxInflight = 0
+        self.maxInflightTotal = 0
+        self.overloadPolicy = "pause"
+        self.workers = 1
+        self.processPoolSize: int = None  # The CPUs shared by the workers.
+        self.threadPoolSize = min(32, (os.cpu_count() or 1) + 4)
+        self.__processPool: Pool = None
+        self.__threadPool: Pool = None
+        self.__executors: Dict[str, str] = {}  # The policies of the modules.
+        self.__methodStats: Dict[str, Dict[str, MethodStats]] = {}
+        self.__handlers: Dict[Tuple[str, str], Handler] = {}
+        self.__workers: List[Worker] = []  # Only in the master process.
+        self.__master: Connection = None  # Only in the worker processes.
+        self.__listener: Socket = None
+        self.__stopped: asyncio.Future = None
+
+        if type(options) == dict:
+            # 0 is a valid value of the water marks.
+            self.highWaterMark = options.get(
+                "highWaterMark", self.highWaterMark)
+            self.lowWaterMark = options.get("lowWaterMark", self.lowWaterMark)
+            self.overflowPolicy = options.get(
+                "overflowPolicy") or self.overflowPolicy
+            self.maxInflight = options.get("maxInflight") or self.maxInflight
+            self.maxInflightTotal = options.get(
+                "maxInflightTotal") or self.maxInflightTotal
+            self.overloadPolicy = options.get(
+                "overloadPolicy") or self.overloadPolicy
+            self.workers = options.get("workers") or self.workers
+            self.processPoolSize = options.get(
+                "processPoolSize") or self.processPoolSize
+            self.threadPoolSize = options.get(
+                "threadPoolSize") or self.threadPoolSize
+
+        if self.lowWaterMark is None:
+            self.lowWaterMark = self.highWaterMark // 2
+
+        if self.overflowPolicy not in OverflowPolicies:
+            raise ValueError(
+                f"Unknown overflow policy '{self.overflowPolicy}'")
+        elif self.overloadPolicy not in OverloadPolicies:
+            raise ValueError(
+                f"Unknown overload policy '{self.overloadPolicy}'")
+
+        # The semaphore shared by all clients to limit the total number of
+        # requests being processed, created once serving.
+        self.__semaphore: asyncio.Semaphore = None
 
     async def open(self):
         pathname = self.pathname
         isUnixSocket = self.protocol == "ws+unix:"
-        wsServer: WebSocketServer
 
         if isUnixSocket and pathname:
             dir = os.path.dirname(pathname)
@@ -40,22 +173,152 @@ class RpcServer(RpcChannel):
             if os.path.exists(pathname):
                 os.unlink(pathname)
 
-        if isUnixSocket:
-            wsServer = await unix_serve(self.__handleConnection, pathname,
-                                        process_request=self.__handleHandshake,
-                                        ping_interval=None,
-                                        ping_timeout=None,
-                                        ssl=self.ssl)
+        if self.workers > 1:
+            if sys.platform == "win32":
+                raise Exception(
+                    "Multiple workers on Windows is currently not supported")
+
+            # The workers share the Unix socket bound ahead, while TCP ports
+            # are shared via SO_REUSEPORT.
+            if isUnixSocket:
+                self.__listener = Socket(AF_UNIX, SOCK_STREAM)
+                self.__listener.bind(pathname)
+
+            self.__forkWorkers()
+
+        await self.__serve()
+
+    async def __serve(self):
+        wsServer: WebSocketServer
+
+        # Created in the running loop (of each worker), since a semaphore may
+        # be bound to the loop at creation.
+        if self.maxInflightTotal:
+            self.__semaphore = asyncio.Semaphore(self.maxInflightTotal)
+
+        options = dict(process_request=self.__handleHandshake,
+                       ping_interval=None,
+                       ping_timeout=None,
+                       compression=None,
+                       extensions=getServerExtensions(self),
+                       ssl=self.ssl)
+
+        if self.protocol == "ws+unix:":
+            if self.__listener:
+                wsServer = await unix_serve(self.__handleConnection,
+                                            sock=self.__listener,
+                                            **options)
+            else:
+                wsServer = await unix_serve(self.__handleConnection,
+                                            self.pathname,
+                                            **options)
         else:
             wsServer = await serve(self.__handleConnection,
                                    self.hostname, self.port,
-                                   process_request=self.__handleHandshake,
-                                   ping_interval=None,
-                                   ping_timeout=None,
-                                   ssl=self.ssl)
+                                   reuse_port=self.workers > 1,
+                                   **options)
 
         self.wsServer = wsServer
 
+    def __forkWorkers(self):
+        ctx = get_context("fork")
+        loop = asyncio.get_event_loop()
+
+        for _ in range(self.workers - 1):
+            (conn, child) = ctx.Pipe()
+            # Not daemonic, so that the worker can start its own executor
+            # pools, it exits by itself once the pipe to the master closes.
+            process = ctx.Process(target=self.__runWorker, args=(child,))
+            process.start()
+            child.close()
+
+            worker = Worker(process, conn)
+            self.__workers.append(worker)
+            loop.add_reader(conn.fileno(), self.__handleWorkerMessage, worker)
+
+    def __runWorker(self, master: Connection):
+        # The event loop of the master process is inherited by fork, but it
+        # cannot be used in the worker process.
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        # Only keep the pipe to the master, so that the worker learns the
+        # master is gone once the pipe is closed.
+        for worker in self.__workers:
+            worker.conn.close()
+
+        self.__workers = []
+        self.__master = master
+
+        # The connections of the clients are inherited as well, which must
+        # not be used by the worker.
+        if self.proxyRoot:
+            self.proxyRoot._remoteSingletons = {}
+            self.proxyRoot._routingTables = {}
+
+        loop.run_until_complete(self.__serveWorker())
+
+    async def __serveWorker(self):
+        loop = asyncio.get_event_loop()
+        self.__stopped = loop.create_future()
+        loop.add_reader(self.__master.fileno(), self.__handleMasterMessage)
+
+        await self.__serve()
+        await self.__stopped
+
+    async def __stopWorker(self):
+        asyncio.get_event_loop().remove_reader(self.__master.fileno())
+        await self.close()
+        self.__master.close()
+        self.__stopped.done() or self.__stopped.set_result(None)
+
+    def __handleMasterMessage(self):
+        try:
+            msg: tuple = self.__master.recv()
+        except Exception:
+            msg = ("close",)  # The master has exited.
+
+        if msg[0] == "register":
+            mod = self.proxyRoot
+
+            # The module proxies are created after forking, get them by name.
+            for name in msg[1][len(mod.__name__) + 1:].split("."):
+                mod = getattr(mod, name)
+
+            asyncio.create_task(self.register(mod, msg[2]))
+        elif msg[0] == "publish":
+            self.__publish(*msg[1:])
+        elif msg[0] == "close":
+            if not self.__stopped.done():
+                asyncio.create_task(self.__stopWorker())
+
+    def __notifyMaster(self, msg: tuple):
+        if self.__master and not self.__master.closed:
+            try:
+                self.__master.send(msg)
+            except Exception:
+                pass
+
+    def __handleWorkerMessage(self, worker: Worker):
+        try:
+            msg: tuple = worker.conn.recv()
+        except Exception:
+            # The worker has exited.
+            asyncio.get_event_loop().remove_reader(worker.conn.fileno())
+            worker.clients = []
+            return
+
+        if msg[0] == "publish":
+            self.__publish(*msg[1:])
+
+            for other in self.__workers:
+                if other is not worker:
+                    other.send(msg)
+        elif msg[0] == "connect":
+            worker.clients.append(msg[1])
+        elif msg[0] == "disconnect" and msg[1] in worker.clients:
+            worker.clients.remove(msg[1])
+
     async def __handleHandshake(self, path: str, headers):
         """
         Verify authentication on the `upgrade` stage.
@@ -82,15 +345,52 @@ class RpcServer(RpcChannel):
         _, _query = path.split("?")
         query = parse_qs(_query)
         clientId = str(query.get("id") and query.get("id")[0] or "")
+        codecName = str(query.get("codec") and query.get("codec")[0] or "")
+        features = str(query.get("features")
+                       and query.get("features")[0] or "").split(",")
+        features = [name for name in features if name in Features]
+
+        # Use the codec requested by the client if it's supported, otherwise
+        # fall back to JSON, which is supported by all implementations.
+        if codecName:
+            codec = getCodec(codecName) or getCodec("JSON")
+        else:
+            codec = getCodec(self.codec)
+
+        # Notify the client that the connection is ready. The handshake
+        # message is always sent in JSON and before any other messages, so that
+        # the client can learn the negotiated codec and features first.
+        try:
+            await client.send(JSON.stringify([ChannelEvents.CONNECT, self.id, {
+                "codec": codec.name,
+                "features": features
+            }]))
+        except Exception:
+            return
+
         self.clients.set(client, clientId)
         self.tasks.set(client, Map())
 
-        # Notify the client that the connection is ready.
-        self.__dispatch(client, ChannelEvents.CONNECT, self.id)
+        self.__notifyMaster(("connect", clientId))
+
+        self.outboxes.set(client, Outbox(client, codec, "batch" in features,
+                                         self.handleError,
+                                         self.highWaterMark,
+                                         self.lowWaterMark,
+                                         self.overflowPolicy,
+                                         "binary" in features))
+
+        if "topics" in features:
+            self.subscriptions.set(client, set())
+        else:
+            self.wildcards.add(client)
 
         await self.__listenMessage(client)  # MUST use 'await'
 
     async def close(self):
+        for worker in self.__workers:
+            worker.send(("close",))
+
         if self.wsServer:
             # wsServer.close() will emit close event on the clients, which
             # already closed tasks and empty maps, so we don't need to do the
@@ -98,73 +398,431 @@ class RpcServer(RpcChannel):
             self.wsServer.close()
             await self.wsServer.wait_closed()
 
+        # Drop the handlers first, so that the calls arriving while the
+        # instances are being destroyed are rejected instead of reaching them.
+        self.__handlers = {}
+
         for mod in self.registry.values():
             await tryLifeCycleFunction(mod, "destroy", self.handleError)
 
+        if self.__workers:
+            loop = asyncio.get_event_loop()
+            deadline = loop.time() + WorkerExitTimeout
+
+            while any(worker.process.is_alive() for worker in self.__workers) \
+                    and loop.time() < deadline:
+                await asyncio.sleep(0.05)
+
+            for worker in self.__workers:
+                loop.remove_reader(worker.conn.fileno())
+                worker.conn.close()
+
+                # A hung worker must not block the master from closing.
+                if worker.process.is_alive():
+                    worker.process.terminate()
+                    worker.process.join(1)
+
+                    if worker.process.is_alive():
+                        worker.process.kill()
+                        worker.process.join()
+
+            self.__workers = []
+
+        if self.__listener:
+            self.__listener.close()
+            self.__listener = None
+
+        if self.__processPool:
+            # Wait for the pool processes to exit, otherwise a worker process
+            # may exit before the pool processes are told to, and hang while
+            # joining them. The queued calls are cancelled, so this only
+            # waits for the running ones.
+            pool = self.__processPool
+            self.__processPool = None
+            await pool.close()
+
+        if self.__threadPool:
+            self.__threadPool.shutdown()
+            self.__threadPool = None
+
         if self.proxyRoot:
             self.proxyRoot._server = None
             self.proxyRoot._remoteSingletons = {}
+            self.proxyRoot._routingTables = {}
             self.proxyRoot = None
 
-    async def register(self, mod: ModuleProxy):
+    async def register(self, mod: ModuleProxy, executor: str = None):
+        """
+        Registers a module proxy to the server, `executor` sets the policy of
+        where the plain (non-coroutine) methods of the module run, which is
+        either `loop` (default), `thread` or `process`, a method marked by
+        `runInThread` or `runInProcess` runs as marked.
+        """
+        if executor and executor not in Executors:
+            raise ValueError(f"Unknown executor '{executor}'")
+
         self.registry[mod.__name__] = mod
+        self._dropHandlers(mod.__name__)
+
+        if executor:
+            self.__executors[mod.__name__] = executor
+        else:
+            self.__executors.pop(mod.__name__, None)
+
+        for worker in self.__workers:
+            worker.send(("register", mod.__name__, executor))
+
         await tryLifeCycleFunction(mod, "init", self.handleError)
+        self.__buildHandlers(mod)
 
     def publish(self, topic: str, data: Any, clients: List[str] = []) -> bool:
         """
         Publishes data to the corresponding topic, if `clients` are provided,
         the topic will only be published to them.
+
+        If the server runs multiple workers, the data is published to the
+        clients of all workers, but the result only reflects the clients of
+        the current process, or, in the master process, the clients known to
+        be connected to the workers.
+        """
+        sent = self.__publish(topic, data, clients)
+        msg = ("publish", topic, data, clients)
+
+        self.__notifyMaster(msg)
+
+        for worker in self.__workers:
+            if worker.send(msg) and any(len(clients) == 0 or id in clients
+                                        for id in worker.clients):
+                sent = True
+
+        return sent
+
+    def invalidateCache(self, module: str, method: str = None,
+                        args: list = None) -> bool:
+        """
+        Discards the memoized results of the module, or only of the method, or
+        only the one for the given arguments, and tells the clients (of all
+        workers) to discard their cached results as well.
         """
+        return self.publish(InvalidationTopic, {
+            "module": module,
+            "method": method,
+            "args": None if args is None else list(args)
+        })
+
+    def __publish(self, topic: str, data: Any, clients: List[str]) -> bool:
+        if topic == InvalidationTopic and type(data) == dict:
+            # Drop the memoized results as well, this runs in every worker.
+            self.__dropResults(data.get("module"), data.get("method"),
+                               data.get("args"))
+
         sent = False
+        targets: Dict[Tuple[Codec, bool], List[Outbox]] = {}
+        subscribers = self.topics.get(topic)
+        sockets = list(self.wildcards)
+
+        if subscribers:
+            sockets.extend(subscribers)
+
+        # Group the sockets by codec, so that the message is only encoded once
+        # for each codec instead of once for each client.
+        for socket in sockets:
+            if len(clients) == 0 or self.clients.get(socket) in clients:
+                outbox: Outbox = self.outboxes.get(socket)
+                target = (outbox.codec, outbox.binary)
+                outboxes = targets.get(target)
+
+                if outboxes is None:
+                    targets[target] = [outbox]
+                else:
+                    outboxes.append(outbox)
 
-        for (socket, id) in self.clients:
-            if len(clients) == 0 or id in clients:
-                self.__dispatch(socket, ChannelEvents.PUBLISH, topic, data)
                 sent = True
 
+        for ((codec, binary), outboxes) in targets.items():
+            try:
+                (msg, buffers) = encodeMessage(
+                    codec, [ChannelEvents.PUBLISH, topic, data], binary)
+            except Exception as err:
+                self.handleError(err)
+                continue
+
+            # The same buffer is queued to all the sockets.
+            for outbox in outboxes:
+                outbox.push(msg, droppable=True, buffers=buffers)
+
         return sent
 
     def getClients(self):
         """
-        Returns all IDs of clients that connected to the server.
+        Returns all IDs of clients that connected to the server, including
+        the ones connected to the workers if called in the master process.
+        """
+        ids = list(self.clients.values())
+
+        for worker in self.__workers:
+            ids.extend(worker.clients)
+
+        # A client may connect with several sockets, or to several workers.
+        return list(dict.fromkeys(ids))
+
+    def getQueueStats(self) -> List[dict]:
+        """
+        Returns the states of the outgoing queues of all clients (one for each
+        connection of a client), each item contains the following keys:
+
+        - `id` The client ID.
+        - `messages` The number of messages waiting to be sent.
+        - `size` The size of the data queued and not yet sent.
+        - `buffered` The size of the data buffered by the transport.
+        - `overflowed` Whether the queue exceeds the high water mark.
+        - `dropped` The number of messages dropped due to overflow.
+        """
+        stats: List[dict] = []
+
+        for (socket, id) in self.clients:
+            outbox: Outbox = self.outboxes.get(socket)
+
+            if outbox:
+                stats.append({
+                    "id": id,
+                    "messages": len(outbox.queue),
+                    "size": outbox.size,
+                    "buffered": outbox.buffered,
+                    "overflowed": outbox.overflowed,
+                    "dropped": outbox.dropped
+                })
+
+        return stats
+
+    def getPoolStats(self) -> Dict[str, dict]:
         """
+        Returns the states of the executor pools that have been started, keyed
+        by the kind of the pool (`thread` or `process`), each item contains
+        the following keys:
 
-        clients: List[str] = []
+        - `size` The number of workers of the pool.
+        - `pending` The number of calls submitted and not yet finished.
+        - `queued` The number of calls waiting for a free worker.
+        - `completed` The number of calls finished.
+        """
+        stats: Dict[str, dict] = {}
 
-        for id in self.clients.values():
-            clients.append(id)
+        if self.__processPool:
+            stats["process"] = self.__processPool.getStats()
 
-        return clients
+        if self.__threadPool:
+            stats["thread"] = self.__threadPool.getStats()
+
+        return stats
+
+    def getMethodStats(self) -> List[dict]:
+        """
+        Returns the statistics of the remote calls of the methods that have
+        been called, each item contains the following keys:
+
+        - `module` The module name.
+        - `method` The method name.
+        - `executor` Where the method runs, `loop`, `thread` or `process`.
+        - `calls` The number of calls.
+        - `pending` The number of calls not yet finished.
+        - `errors` The number of calls that raised an error.
+        - `time` The total duration of the finished calls in milliseconds.
+        """
+        stats: List[dict] = []
+
+        for (module, methods) in self.__methodStats.items():
+            for (method, item) in methods.items():
+                stats.append({
+                    "module": module,
+                    "method": method,
+                    "executor": item.executor,
+                    "calls": item.calls,
+                    "pending": item.pending,
+                    "errors": item.errors,
+                    "time": item.time
+                })
+
+        return stats
+
+    def getCacheStats(self) -> List[dict]:
+        """
+        Returns the statistics of the memoized results of the cacheable
+        methods, each item contains the `module` and `method` name, the number
+        of entries (`size`), `hits` and `misses`.
+        """
+        stats: List[dict] = []
+
+        for ((module, method), handler) in self.__handlers.items():
+            if handler.cache:
+                item = handler.cache.getStats()
+                item.update({"module": module, "method": method})
+                stats.append(item)
+
+        return stats
+
+    def __getMethodStats(self, module: str, method: str,
+                         executor: str) -> MethodStats:
+        methods = self.__methodStats.get(module)
+
+        if methods is None:
+            methods = self.__methodStats[module] = {}
+
+        stats = methods.get(method)
+
+        if stats is None or stats.executor != executor:
+            stats = methods[method] = MethodStats(executor)
+
+        return stats
+
+    def __buildHandlers(self, mod: ModuleProxy):
+        # Resolve the methods ahead once the module is ready, so that calling
+        # them only takes a lookup of the table. Methods that can't be found
+        # here (e.g. provided via `__getattr__`) are resolved on their first
+        # call.
+        self._dropHandlers(mod.__name__)
+        target = mod.__ctor__ or getInstance(mod._root, mod.__name__)
+
+        for name in dir(target):
+            if name[0] != "_" and callable(getattr(target, name, None)):
+                try:
+                    self.__createHandler(mod.__name__, name)
+                except Exception:
+                    pass
+
+    def __dropResults(self, module: str, method: str = None,
+                      args: list = None):
+        key = getCacheKey(args) if args is not None else None
+
+        for ((_module, _method), handler) in self.__handlers.items():
+            if handler.cache is None or _module != module \
+                    or (method and _method != method):
+                continue
+            elif key is None:
+                handler.cache.clear()
+            else:
+                handler.cache.delete(key)
+
+    def _dropHandlers(self, module: str):
+        for key in [key for key in self.__handlers if key[0] == module]:
+            del self.__handlers[key]
+
+    def __createHandler(self, module: str, method: str) -> Handler:
+        mod = self.registry.get(module)
+
+        if not mod:
+            throwUnavailableError(module)
+
+        ins = getInstance(mod._root, module)
+
+        if getattr(ins, "__readyState", -1) == 0:
+            throwUnavailableError(module)
+
+        fn = getattr(ins, method)
+        executor = resolveExecutor(fn, self.__executors.get(module))
+        stats = self.__getMethodStats(module, method, executor)
+        handler = self.__handlers[(module, method)] = Handler(ins, fn,
+                                                              executor, stats)
+        return handler
+
+    async def __runInThread(self, fn: Callable, args: list):
+        if self.__threadPool is None:
+            self.__threadPool = createThreadPool(self.threadPoolSize)
+
+        return await self.__threadPool.run(fn, *args)
+
+    async def __runInProcess(self, socket: WebSocket, module: str,
+                             method: str, args: list):
+        outbox: Outbox = self.outboxes.get(socket)
+        codec = outbox and outbox.codec or getCodec(self.codec)
+
+        # The pool is started on the first call, so that servers that never
+        # run methods in it don't spawn processes for nothing.
+        if self.__processPool is None:
+            size = self.processPoolSize \
+                or max(1, (os.cpu_count() or 1) // self.workers)
+            self.__processPool = createProcessPool(size)
+
+        res = await self.__processPool.run(invokeInProcess, codec.name,
+                                           module, method, codec.encode(args))
+        return codec.decode(res)
+
+    def __subscribe(self, socket: WebSocket, topic: str):
+        topics: Set[str] = self.subscriptions.get(socket)
+
+        if topics is not None:
+            topics.add(topic)
+            subscribers = self.topics.get(topic)
+
+            if subscribers is None:
+                self.topics[topic] = {socket}
+            else:
+                subscribers.add(socket)
+
+    def __unsubscribe(self, socket: WebSocket, topic: str):
+        topics: Set[str] = self.subscriptions.get(socket)
+
+        if topics is not None:
+            topics.discard(topic)
+            subscribers = self.topics.get(topic)
+
+            if subscribers is not None:
+                subscribers.discard(socket)
+
+                if len(subscribers) == 0:
+                    self.topics.pop(topic)
 
     def __dispatch(self, socket: WebSocket, event: int, taskId, data=None):
-        if socket.open:
+        outbox: Outbox = self.outboxes.get(socket)
+
+        if outbox and socket.open:
             if event == ChannelEvents.THROW and isinstance(data, Exception):
+                code = getattr(data, "code", None)
                 data = {
                     "name": type(data).__name__,
                     "message": str(data.args[0])
                 }
 
+                if type(code) == str:
+                    data["code"] = code
+
             _data: Any = None
 
-            if event == ChannelEvents.CONNECT:
-                _data = [event, str(taskId)]
-            elif event == ChannelEvents.PONG:
+            if event == ChannelEvents.PONG:
                 _data = [event, int(taskId)]
-            elif self.codec == "JSON":
+            else:
                 _data = [event, taskId, data]
 
-            if _data:
-                try:
-                    msg = JSON.stringify(_data)
-                    asyncio.create_task(socket.send(msg))
-                except Exception as err:
-                    self.__dispatch(socket, ChannelEvents.THROW, taskId, err)
+            try:
+                (msg, buffers) = encodeMessage(outbox.codec, _data,
+                                               outbox.binary)
+                outbox.push(msg, buffers=buffers)
+            except Exception as err:
+                self.__dispatch(socket, ChannelEvents.THROW, taskId, err)
 
     async def __listenMessage(self, socket: WebSocket):
+        outbox: Outbox = self.outboxes.get(socket)
+        semaphores: List[asyncio.Semaphore] = []
+
+        # The semaphore of the client is acquired before the global one, so
+        # that a busy client waits on its own semaphore instead of taking
+        # the global slots.
+        if self.maxInflight:
+            semaphores.append(asyncio.Semaphore(self.maxInflight))
+
+        if self.__semaphore:
+            semaphores.append(self.__semaphore)
+
         while True:
             msg: Any = None
 
             try:
+                # Stop reading messages from the client until its outgoing
+                # queue drains, so it can't make the server generate more data
+                # than it can receive.
+                if outbox.policy == "pause" and outbox.overflowed:
+                    await outbox.drain()
+
                 msg = await socket.recv()
             except ConnectionClosedOK:
                 pass
@@ -178,13 +836,62 @@ class RpcServer(RpcChannel):
                 asyncio.create_task(self.__handleDisconnection(socket))
                 break
 
-            # Process the message asynchronously.
-            asyncio.create_task(self.__handleMessage(socket, msg))
+            reqs = self.__parseRequests(socket, msg)
+
+            # The binary frames of the message follow it immediately.
+            if len(reqs) == 1 and isEnvelope(reqs[0]):
+                req = await readEnvelope(socket, reqs[0], self.handleError)
+                reqs = self.__parseRequests(socket, req) if req else []
+
+            # Process the messages asynchronously.
+            for req in reqs:
+                if not semaphores or req[0] not in RequestEvents:
+                    asyncio.create_task(self.__handleMessage(socket, req))
+                    continue
+
+                if self.overloadPolicy == "reject" \
+                        and req[0] == ChannelEvents.INVOKE \
+                        and any(sem.locked() for sem in semaphores):
+                    err = OverloadError(f"Server {self.id} is overloaded")
+                    self.__dispatch(socket, ChannelEvents.THROW, req[1], err)
+                    continue
+
+                # If the limit is reached, this will stop reading messages
+                # from the client until a slot is released.
+                for sem in semaphores:
+                    await sem.acquire()
+
+                asyncio.create_task(
+                    self.__handleRequest(socket, req, semaphores))
+
+    async def __handleRequest(self, socket: WebSocket, req: list,
+                              semaphores: List[asyncio.Semaphore]):
+        try:
+            await self.__handleMessage(socket, req)
+        finally:
+            for sem in semaphores:
+                sem.release()
 
     async def __handleDisconnection(self, socket: WebSocket):
+        if self.clients.has(socket):
+            self.__notifyMaster(("disconnect", self.clients.get(socket)))
+
         tasks: Map = self.tasks.get(socket)
+        topics: Set[str] = self.subscriptions.get(socket)
+        outbox: Outbox = self.outboxes.get(socket)
         self.tasks.delete(socket)
         self.clients.delete(socket)
+        self.outboxes.delete(socket)
+        self.wildcards.discard(socket)
+
+        if outbox:
+            outbox.close()
+
+        if topics is not None:
+            for topic in list(topics):
+                self.__unsubscribe(socket, topic)
+
+            self.subscriptions.delete(socket)
 
         if tasks:
             # Close all suspended tasks of the socket.
@@ -192,18 +899,34 @@ class RpcServer(RpcChannel):
             for task in tasks.values():
                 asyncio.create_task(task.aclose())
 
-    async def __handleMessage(self, socket: WebSocket, res: Any):
-        if type(res) != str:
-            return
+    def __parseRequests(self, socket: WebSocket, msg: Any) -> List[list]:
+        outbox: Outbox = self.outboxes.get(socket)
+
+        if not outbox:
+            return []
 
         req: list = None
 
-        try:
-            req = JSON.parse(res)
-        except Exception as err:
-            self.handleError(err)
+        if type(msg) == list:  # opened envelope
+            req = msg
+        elif type(msg) not in (str, bytes):
+            return []
+        else:
+            try:
+                req = outbox.codec.decode(msg)
+            except Exception as err:
+                self.handleError(err)
+
+        if type(req) != list or len(req) == 0:
+            return []
+
+        reqs = req if type(req[0]) == list else [req]  # batch frame or not
+
+        return [req for req in reqs
+                if type(req) == list and len(req) >= 2 and type(req[0]) == int]
 
-        if type(req) != list or len(req) == 0 or type(req[0]) != int:
+    async def __handleMessage(self, socket: WebSocket, req: list):
+        if type(req) != list or len(req) < 2 or type(req[0]) != int:
             return
 
         event: int = req[0]
@@ -229,6 +952,12 @@ class RpcServer(RpcChannel):
         elif event == ChannelEvents.PING:
             self.__dispatch(socket, ChannelEvents.PONG, taskId)
 
+        elif event == ChannelEvents.SUBSCRIBE:
+            self.__subscribe(socket, str(taskId))
+
+        elif event == ChannelEvents.UNSUBSCRIBE:
+            self.__unsubscribe(socket, str(taskId))
+
     async def __handleInvokeEvent(
         self,
         socket: WebSocket,
@@ -237,39 +966,126 @@ class RpcServer(RpcChannel):
         method: str,
         args: list
     ):
-        event: int = 0
-        data: Any = None
-        tasks: Map = self.tasks.get(socket)
+        handler = self.__handlers.get((module, method))
+
+        # The instance may have been destroyed after the handler was created.
+        if handler is None or getattr(handler.ins, "__readyState", -1) == 0:
+            try:
+                handler = self.__createHandler(module, method)
+            except Exception as err:
+                # Calls of unavailable modules and methods are not counted.
+                self.__dispatch(socket, ChannelEvents.THROW, taskId, err)
+                return
+
+        cache = handler.cache
+        key = getCacheKey(args) if cache else None
+
+        if key is None:
+            (event, data) = await self.__invoke(socket, taskId, handler,
+                                                module, method, args)
+            self.__dispatch(socket, event, taskId, data)
+            return
+
+        (hit, data) = cache.get(key)
+        future = handler.inflight.get(key)
+
+        if hit:
+            handler.stats.calls += 1
+            self.__dispatch(socket, ChannelEvents.RETURN, taskId, data)
+            return
+        elif future is not None:
+            # Wait for the identical call being processed.
+            handler.stats.calls += 1
+
+            try:
+                data = await asyncio.shield(future)
+                event = ChannelEvents.RETURN
+            except Exception as err:
+                event = ChannelEvents.THROW
+                data = err
+
+            self.__dispatch(socket, event, taskId, data)
+            return
+
+        future = handler.inflight[key] = asyncio.get_event_loop()\
+            .create_future()
+        generation = cache.generation
 
         try:
-            mod = self.registry.get(module)
+            (event, data) = await self.__invoke(socket, taskId, handler,
+                                                module, method, args)
+        except BaseException:
+            # The call is interrupted (e.g. cancelled), release the callers
+            # waiting for it instead of leaving them to time out.
+            future.set_exception(Exception(
+                f"{module}.{method}() was interrupted"))
+            future.exception()  # Retrieved, in case there is no waiter.
+            raise
+        finally:
+            if handler.inflight.get(key) is future:
+                handler.inflight.pop(key)
 
-            if not mod:
-                throwUnavailableError(module)
+        if event == ChannelEvents.RETURN:
+            future.set_result(data)
 
-            app = mod._root
-            ins = getInstance(app, module)
+            if generation == cache.generation:
+                cache.set(key, data)
+        else:
+            future.set_exception(data if event == ChannelEvents.THROW
+                                 else TypeError(f"{module}.{method}() "
+                                                "is not cacheable"))
+            future.exception()  # Retrieved, in case there is no waiter.
 
-            if getattr(ins, "__readyState", -1) == 0:
-                throwUnavailableError(module)
+        self.__dispatch(socket, event, taskId, data)
 
-            task = getattr(ins, method)(*args)
+    async def __invoke(self, socket: WebSocket, taskId: int, handler: Handler,
+                       module: str, method: str, args: list) -> tuple:
+        event: int = 0
+        data: Any = None
+        tasks: Map = self.tasks.get(socket)
+        loop = asyncio.get_event_loop()
+        stats = handler.stats
+        stats.calls += 1
+        stats.pending += 1
+        start = loop.time()
 
-            if hasattr(task, "__aiter__") and hasattr(task, "__anext__"):
-                tasks.set(taskId, task)
-                event = ChannelEvents.INVOKE
-            elif hasattr(task, "__await__"):
-                data = await task
+        try:
+            if handler.executor == "process":
+                data = await self.__runInProcess(socket, module, method, args)
                 event = ChannelEvents.RETURN
-            else:
-                data = task
+            elif handler.kind == "coroutine":
+                data = await handler.fn(*args)
                 event = ChannelEvents.RETURN
+            elif handler.kind == "asyncgen":
+                tasks.set(taskId, handler.fn(*args))
+                event = ChannelEvents.INVOKE
+            else:
+                if handler.executor == "thread":
+                    task = await self.__runInThread(handler.fn, args)
+                else:
+                    task = handler.fn(*args)
+
+                # A plain function may still return an awaitable or an
+                # asynchronous generator, e.g. when it's decorated.
+                if hasattr(task, "__aiter__") and hasattr(task, "__anext__"):
+                    tasks.set(taskId, task)
+                    event = ChannelEvents.INVOKE
+                elif hasattr(task, "__await__"):
+                    data = await task
+                    event = ChannelEvents.RETURN
+                else:
+                    data = task
+                    event = ChannelEvents.RETURN
 
         except Exception as err:
             event = ChannelEvents.THROW
             data = err
+            stats.errors += 1
 
-        self.__dispatch(socket, event, taskId, data)
+        stats.pending -= 1
+        stats.time += (loop.time() - start) * 1000
+
+        return (event, data)
 
     async def __handleGeneratorEvent(
         self,
@@ -293,7 +1109,27 @@ class RpcServer(RpcChannel):
             else:
                 input = None
 
-            if event == ChannelEvents.YIELD:
+            if event == ChannelEvents.PULL:
+                # Push the values ahead as many as the client grants, the
+                # client must not send other requests of the generator until
+                # all the credits are fulfilled.
+                credits = min(max(int(input or 1), 1), MaxCredits)
+                outbox: Outbox = self.outboxes.get(socket)
+
+                for _ in range(credits - 1):
+                    data = await task.asend(None)
+                    self.__dispatch(socket, ChannelEvents.YIELD, taskId,
+                                    {"done": False, "value": data})
+
+                    # Don't let the pushed values pile up in the outbox
+                    # faster than the client reads them.
+                    if outbox:
+                        await outbox.drain()
+
+                event = ChannelEvents.YIELD
+                data = await task.asend(None)
+                data = {"done": False, "value": data}
+            elif event == ChannelEvents.YIELD:
                 data = await task.asend(input)
                 data = {"done": False, "value": data}
             elif event == ChannelEvents.RETURN:
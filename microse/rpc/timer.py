@@ -0,0 +1,115 @@
+from typing import Callable, Dict, Tuple
+import asyncio
+import math
+
+
+class TimerWheel:
+    """
+    Schedules timeout callbacks in coarse-grained buckets instead of creating
+    one timer handle of the event loop for each of them. Deadlines are rounded
+    up to the next tick (`resolution` in milliseconds), all the callbacks of
+    the same tick are expired in one pass, and only the earliest tick occupies
+    a timer handle of the event loop at a time.
+
+    Callbacks may run up to `resolution` late, but never early.
+    """
+
+    def __init__(self, resolution=50):
+        self.resolution = resolution / 1000
+        self.buckets: Dict[int, Dict[int, Callable]] = {}
+        self.__count = 0
+        self.__nextId = 0
+        self.__nextTick: int = None
+        self.__handle: asyncio.TimerHandle = None
+
+    def __len__(self):
+        return self.__count
+
+    def add(self, timeout: float, callback: Callable) -> Tuple[int, int]:
+        """
+        Schedules the callback to run after `timeout` milliseconds, returns a
+        handle that can be passed to `cancel()`.
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout / 1000
+        tick = math.ceil(deadline / self.resolution)
+        bucket = self.buckets.get(tick)
+
+        if bucket is None:
+            bucket = self.buckets[tick] = {}
+
+        self.__nextId += 1
+        bucket[self.__nextId] = callback
+        self.__count += 1
+
+        if self.__nextTick is None or tick < self.__nextTick:
+            self.__schedule(loop, tick)
+
+        return (tick, self.__nextId)
+
+    def cancel(self, handle: Tuple[int, int]) -> bool:
+        """
+        Cancels a scheduled callback, returns `False` if the callback has
+        already run or been canceled.
+        """
+        (tick, id) = handle
+        bucket = self.buckets.get(tick)
+
+        if bucket is None or bucket.pop(id, None) is None:
+            return False
+
+        self.__count -= 1
+
+        if not bucket:
+            # The timer handle of the event loop is left as is, it will find
+            # nothing due and move on to the next tick.
+            self.buckets.pop(tick)
+
+        return True
+
+    def clear(self):
+        """
+        Cancels all the scheduled callbacks.
+        """
+        self.buckets.clear()
+        self.__count = 0
+        self.__nextTick = None
+
+        if self.__handle:
+            self.__handle.cancel()
+            self.__handle = None
+
+    def __schedule(self, loop: asyncio.AbstractEventLoop, tick: int):
+        if self.__handle:
+            self.__handle.cancel()
+
+        self.__nextTick = tick
+        self.__handle = loop.call_at(tick * self.resolution, self.__expire)
+
+    def __expire(self):
+        loop = asyncio.get_event_loop()
+        due = self.__nextTick
+        self.__handle = None
+        self.__nextTick = None
+
+        # The event loop has decided the scheduled tick is due, expire it
+        # along with any earlier ones.
+        for tick in sorted(tick for tick in self.buckets if tick <= due):
+            bucket = self.buckets.pop(tick)
+            self.__count -= len(bucket)
+
+            for callback in bucket.values():
+                try:
+                    callback()
+                except Exception as err:
+                    loop.call_exception_handler({
+                        "message": "Exception in timeout callback",
+                        "exception": err,
+                    })
+
+        if self.buckets:
+            tick = min(self.buckets)
+
+            # The callbacks may have scheduled a later tick meanwhile.
+            if self.__nextTick is None or tick < self.__nextTick:
+                self.__schedule(loop, tick)
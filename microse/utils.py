@@ -2,6 +2,7 @@ import time
 import json
 import random
 import string
+import zlib
 from enum import IntEnum
 from typing import Callable, Any
 from inspect import isclass
@@ -14,7 +15,17 @@ if type(__global) != dict:
 
 
 class ChannelEvents(IntEnum):
-    CONNECT, INVOKE, RETURN, THROW, YIELD, PUBLISH, PING, PONG = range(1, 9)
+    CONNECT, INVOKE, RETURN, THROW, YIELD, PUBLISH, PING, PONG, \
+        SUBSCRIBE, UNSUBSCRIBE, PULL, BINARY = range(1, 13)
+
+
+class OverloadError(Exception):
+    """
+    Raised when the server refuses a request because it's overloaded, the
+    request has not been processed and is safe to be retried on another
+    server.
+    """
+    code = "ERR_OVERLOADED"
 
 
 class JSONSerializable(json.JSONEncoder):
@@ -46,55 +57,54 @@ class JSON():
 
 
 class Map:
+    """
+    A JavaScript-like map backed by a dict, keys are looked up by their hash
+    in constant time, and entries are iterated in insertion order.
+    """
+
     @property
     def size(self):
-        return len(self.__keys)
+        return len(self.__entries)
 
     def __init__(self, entry=[]):
-        self.__keys = []
-        self.__values = []
+        self.__entries = {}
 
         for (key, value) in entry:
             self.set(key, value)
 
     def set(self, key, value):
-        self.__keys.append(key)
-        self.__values.append(value)
+        self.__entries[key] = value
 
     def get(self, key):
-        try:
-            index = self.__keys.index(key)
-            return self.__values[index]
-        except:
-            return None
+        return self.__entries.get(key)
 
     def delete(self, key):
         try:
-            index = self.__keys.index(key)
-            self.__keys.pop(index)
-            self.__values.pop(index)
+            del self.__entries[key]
             return True
-        except:
+        except KeyError:
             return False
 
     def has(self, key):
-        return key in self.__keys
+        return key in self.__entries
 
     def clear(self):
-        self.__keys = []
-        self.__values = []
+        self.__entries = {}
+
+    # Iterations run on a snapshot of the entries, so that the map can be
+    # modified during iterating.
 
     def keys(self):
-        for key in self.__keys:
+        for key in list(self.__entries):
             yield key
 
     def values(self):
-        for value in self.__values:
+        for value in list(self.__entries.values()):
             yield value
 
     def __iter__(self):
-        for i in range(len(self.__keys)):
-            yield (self.__keys[i], self.__values[i])
+        for entry in list(self.__entries.items()):
+            yield entry
 
 
 def sequid(id=0):
@@ -112,6 +122,25 @@ def now():
     return round(time.time_ns() / 1000000)
 
 
+def movingAverage(average: float, sample: float, weight=0.2) -> float:
+    """
+    Folds the sample into the exponentially weighted moving average, the
+    sample is taken as is if there is no average yet.
+    """
+    if average is None:
+        return sample
+    else:
+        return average + (sample - average) * weight
+
+
+def stableHash(value: str) -> int:
+    """
+    Hashes a string into a 32-bit integer, unlike the builtin `hash()`, the
+    result is the same in every process regardless of `PYTHONHASHSEED`.
+    """
+    return zlib.crc32(value.encode("utf-8"))
+
+
 def evalRouteId(value) -> int:
     _type = type(value)
 
@@ -119,17 +148,38 @@ def evalRouteId(value) -> int:
         return 0
     if _type in [bool, int, float]:
         return int(value)
-    elif _type == str or _type == complex:
-        return abs(hash(value))
+    elif _type == str:
+        return stableHash(value)
+    elif _type == complex:
+        return stableHash(str(value))
     elif callable(value):
-        return abs(hash(value.__name__))
+        return stableHash(value.__name__)
     else:
         try:
-            return abs(hash(JSON.stringify(value)))
+            return stableHash(JSON.stringify(value))
         except:
             return id(value)
 
 
+def rendezvousScore(routeId: int, key: str) -> int:
+    """
+    Scores a candidate (identified by `key`) for the route, the route goes to
+    the candidate with the highest score (rendezvous hashing). When candidates
+    are added or removed, only the routes that belonged to them are remapped.
+    """
+    x = (stableHash(key) << 32 ^ routeId) & 0xFFFFFFFFFFFFFFFF
+
+    # The finalizer of MurmurHash3, which spreads every input bit over the
+    # output bits.
+    x ^= x >> 33
+    x = (x * 0xFF51AFD7ED558CCD) & 0xFFFFFFFFFFFFFFFF
+    x ^= x >> 33
+    x = (x * 0xC4CEB9FE1A85EC53) & 0xFFFFFFFFFFFFFFFF
+    x ^= x >> 33
+
+    return x
+
+
 def parseError(data):
     err: Exception = None
 
@@ -145,6 +195,8 @@ def parseError(data):
             err = SyntaxError(message)
         elif name == "RangeError":
             err = OverflowError(message)
+        elif code == OverloadError.code:
+            err = OverloadError(message)
         elif code == "ERR_SYSTEM_ERROR":
             err = SystemError(message)
         elif code in ["MODULE_NOT_FOUND", "ERR_MODULE_NOT_FOUND"]:
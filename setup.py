@@ -24,6 +24,10 @@ setuptools.setup(
         "Operating System :: OS Independent",
     ],
     install_requires=[
-        "websockets>=8.0"
-    ]
+        "websockets>=10.0"
+    ],
+    extras_require={
+        "msgpack": ["msgpack>=1.0"],
+        "cbor": ["cbor2>=5.0"]
+    }
 )
@@ -160,6 +160,28 @@ class RpcCommonTest:
         await client.close()
         await server.terminate()
 
+    async def test_iterating_remote_generator_after_awaiting_it(self):
+        server = await serve()
+        client = await self.app.connect(config)
+
+        await client.register(self.app.services.detail)
+
+        # Plain calls are released once they're responded.
+        name = await self.app.services.detail.getName()
+        self.utils.assertEqual(name, "Mr. World")
+        self.utils.assertEqual(client.tasks.size, 0)
+
+        gen = self.app.services.detail.getOrgs()
+        self.utils.assertEqual(await gen, None)
+        self.utils.assertEqual(client.tasks.size, 0)
+
+        result = [org async for org in gen]
+        self.utils.assertListEqual(result, ["Mozilla", "GitHub", "Linux"])
+        self.utils.assertEqual(client.tasks.size, 0)
+
+        await client.close()
+        await server.terminate()
+
     async def test_invoking_asend_method_on_remote_generator(self):
         server = await serve()
         client = await self.app.connect(config)
@@ -231,6 +253,25 @@ class RpcCommonTest:
         await client.close()
         await server.terminate()
 
+    async def test_triggering_timeout_error_of_concurrent_calls(self):
+        server = await serve()
+        client = await self.app.connect(config)
+
+        await client.register(self.app.services.detail)
+
+        results = await asyncio.gather(*[
+            self.app.services.detail.triggerTimeout() for _ in range(3)
+        ], return_exceptions=True)
+
+        for err in results:
+            self.utils.assertTrue(isinstance(err, TimeoutError))
+
+        # All the timeouts share one timer, which is emptied afterwards.
+        self.utils.assertEqual(len(client.timers), 0)
+
+        await client.close()
+        await server.terminate()
+
     async def test_refusing_connect_when_secret_not_match(self):
         server = await serve({"USE_SECRET": "tesla"})
         err: Exception = None
@@ -1,4 +1,9 @@
+from microse.rpc.cache import cacheable, invalidate
+from microse.rpc.executor import runInProcess
 import asyncio
+import os
+import threading
+import time
 
 
 class detail:
@@ -8,6 +13,7 @@ class detail:
 
         self.propFn = fn
         self.name = name
+        self.count = 0
 
     async def setName(self, name: str):
         self.name = name
@@ -15,11 +21,40 @@ class detail:
     async def getName(self):
         return self.name
 
+    @cacheable(ttl=60000, maxEntries=10)
+    async def countCalls(self, key: str = ""):
+        self.count += 1
+        count = self.count
+        await asyncio.sleep(0.01)
+        return count
+
+    async def resetCount(self):
+        self.count = 0
+        invalidate(self.countCalls)
+
+    def getPid(self):
+        return os.getpid()
+
+    def getThreadName(self):
+        return threading.current_thread().name
+
+    @runInProcess
+    def getPidInProcess(self, duration: float = 0):
+        time.sleep(duration)  # Blocks the pool process only.
+        return os.getpid()
+
     async def getOrgs(self):
         yield "Mozilla"
         yield "GitHub"
         yield "Linux"
 
+    def getOrgsLazily(self):
+        return self.getOrgs()
+
+    async def getNumbers(self, count: int):
+        for i in range(count):
+            yield i
+
     async def repeatAfterMe(self):
         value = None
 
@@ -32,6 +67,10 @@ class detail:
     async def raiseError(self):
         raise TypeError("something went wrong")
 
+    async def wait(self, duration: float):
+        await asyncio.sleep(duration)
+        return duration
+
     async def triggerTimeout(self):
         await asyncio.sleep(1.5)
 
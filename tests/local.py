@@ -6,6 +6,7 @@ from tests.app.services.detail import detail
 import tests.app.config as _config
 from os.path import normpath
 import os
+import sys
 
 
 class LocalInstanceTest(AioTestCase):
@@ -21,6 +22,30 @@ class LocalInstanceTest(AioTestCase):
                          "tests.app.services.detail")
         self.assertEqual(app.services.detail.__ctor__, detail)
 
+    def test_caching_resolved_module_and_class(self):
+        mod = sys.modules["tests.app.simple"]
+        self.assertIs(app.simple.__module__, mod)
+        self.assertIs(app.simple.__ctor__, simple)
+
+        class other(simple):
+            pass
+
+        # The class is resolved again only after invalidating.
+        mod.simple = other
+        self.assertIs(app.simple.__ctor__, simple)
+        app.simple.invalidate()
+        self.assertIs(app.simple.__ctor__, other)
+
+        mod.simple = simple
+        app.simple.invalidate()
+        self.assertIs(app.simple.__ctor__, simple)
+
+    def test_reloading_module(self):
+        _config.hostname = "localhost"
+        app.config.reload()
+        self.assertEqual(app.config.__module__.hostname, "127.0.0.1")
+        self.assertEqual(_config.hostname, "127.0.0.1")
+
     async def test_getting_singleton_instance(self):
         await app.services.detail.setName("Mr. Handsome")
         self.assertEqual(await app.services.detail.getName(), "Mr. Handsome")
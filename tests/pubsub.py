@@ -1,9 +1,12 @@
 import unittest
 from microse.utils import Map
+from microse.rpc.codec import getCodec
+from microse.rpc.server import RpcServer
 from tests.aio import AioTestCase
 from tests.base import app, config
 import asyncio
 import os
+import sys
 
 class PubSubTest(AioTestCase):
     async def test_getting_all_clients(self):
@@ -16,6 +19,83 @@ class PubSubTest(AioTestCase):
         await client.close()
         await server.close()
 
+    async def test_publishing_topic_once_to_client_with_connections(self):
+        server = await app.serve(config)
+        _config = config.copy()
+        _config["connections"] = 3
+        client = await app.connect(_config)
+        messages = []
+
+        client.subscribe("set-data", lambda msg: messages.append(msg))
+        self.assertListEqual(server.getClients(), [client.id])
+        self.assertEqual(len(server.getQueueStats()), 3)
+
+        server.publish("set-data", "Mr. World")
+        await asyncio.sleep(0.1)
+
+        self.assertListEqual(messages, ["Mr. World"])
+
+        await client.close()
+        await server.close()
+
+    # Multiple workers are not supported on Windows, and SO_REUSEPORT on
+    # macOS doesn't spread the connections across the workers.
+    @unittest.skipIf(sys.platform != "linux",
+                     "multiple workers are tested on Linux only")
+    async def test_publishing_topic_to_clients_of_all_workers(self):
+        _config = config.copy()
+        _config["workers"] = 2
+        server = await app.serve(_config)
+        clients = [await app.connect(config) for _ in range(4)]
+        received = []
+
+        for client in clients:
+            client.subscribe("set-data", lambda msg: received.append(msg))
+
+        # The workers report their clients asynchronously.
+        while len(server.getClients()) < 4:
+            await asyncio.sleep(0.1)
+
+        self.assertSetEqual(set(server.getClients()),
+                            set(client.id for client in clients))
+        self.assertTrue(server.publish("set-data", "Mr. World"))
+
+        while len(received) < 4:
+            await asyncio.sleep(0.1)
+
+        self.assertListEqual(received, ["Mr. World"] * 4)
+
+        for client in clients:
+            await client.close()
+
+        await server.close()
+
+    async def test_getting_queue_stats_of_clients(self):
+        server = await app.serve(config)
+        client = await app.connect(config)
+        stats = server.getQueueStats()
+
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0]["id"], client.id)
+        self.assertEqual(stats[0]["messages"], 0)
+        self.assertEqual(stats[0]["size"], 0)
+        self.assertFalse(stats[0]["overflowed"])
+        self.assertEqual(stats[0]["dropped"], 0)
+
+        await client.close()
+        await server.close()
+
+    def test_setting_water_marks_of_server(self):
+        server = RpcServer({"port": 18888})
+        self.assertEqual(server.lowWaterMark, server.highWaterMark // 2)
+
+        server = RpcServer({"port": 18888, "lowWaterMark": 0})
+        self.assertEqual(server.lowWaterMark, 0)
+
+        server = RpcServer({"port": 18888, "highWaterMark": 0})
+        self.assertEqual(server.highWaterMark, 0)
+        self.assertEqual(server.lowWaterMark, 0)
+
     async def test_subscribing_and_publishing_topic(self):
         server = await app.serve(config)
         client = await app.connect(config)
@@ -122,6 +202,89 @@ class PubSubTest(AioTestCase):
         await client.close()
         await server.close()
 
+    async def test_publishing_topic_to_multiple_clients(self):
+        server = await app.serve(config)
+        clients = [await app.connect(config) for _ in range(3)]
+        codec = getCodec("JSON")
+        encode = codec.encode
+        encodeTimes = 0
+        received = []
+
+        def countingEncode(data):
+            nonlocal encodeTimes
+            encodeTimes += 1
+            return encode(data)
+
+        for client in clients:
+            client.subscribe("set-data", lambda msg: received.append(msg))
+
+        codec.encode = countingEncode
+
+        try:
+            self.assertTrue(server.publish("set-data", "Mr. World"))
+        finally:
+            codec.encode = encode
+
+        while len(received) < 3:
+            await asyncio.sleep(0.1)
+
+        self.assertEqual(encodeTimes, 1)
+        self.assertListEqual(received, ["Mr. World"] * 3)
+
+        for client in clients:
+            await client.close()
+
+        await server.close()
+
+    async def test_publishing_topic_to_subscribers_only(self):
+        clientConfig = config.copy()
+        clientConfig["topicFilter"] = True
+        server = await app.serve(config)
+        client = await app.connect(clientConfig)
+        data = ""
+
+        def handle(msg):
+            nonlocal data
+            data = msg
+
+        client.subscribe("set-data", handle)
+
+        while not server.topics.get("set-data"):
+            await asyncio.sleep(0.1)
+
+        self.assertFalse(server.publish("set-data-2", "Mr. Handsome"))
+        self.assertTrue(server.publish("set-data", "Mr. World"))
+
+        while not data:
+            await asyncio.sleep(0.1)
+
+        self.assertEqual(data, "Mr. World")
+
+        client.unsubscribe("set-data", handle)
+
+        while server.topics.get("set-data"):
+            await asyncio.sleep(0.1)
+
+        self.assertFalse(server.publish("set-data", "Mr. World"))
+        self.assertFalse(client.topics.has("set-data"))
+
+        # Subscribing again registers the topic again.
+        data = ""
+        client.subscribe("set-data", handle)
+
+        while not server.topics.get("set-data"):
+            await asyncio.sleep(0.1)
+
+        self.assertTrue(server.publish("set-data", "Mr. Handsome"))
+
+        while not data:
+            await asyncio.sleep(0.1)
+
+        self.assertEqual(data, "Mr. Handsome")
+
+        await client.close()
+        await server.close()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -3,7 +3,14 @@ from tests.aio import AioTestCase
 from tests.RpcCommon import RpcCommonTest
 from tests.base import app, config
 from tests.server.process import serve
+from microse.app import ModuleProxyApp
+from microse.rpc.codec import getCodec
+from microse.rpc.compression import ThresholdDeflate
+from microse.rpc.server import Features
+from microse.utils import ChannelEvents, OverloadError, tryLifeCycleFunction
+import asyncio
 import sys
+import threading
 import os
 
 
@@ -23,10 +30,581 @@ class RemoteInstanceTest(AioTestCase, RpcCommonTest):
         self.assertEqual(client.dsn, "ws+unix:" + sockPath)
         self.assertEqual(client.serverId, "ws+unix:" + sockPath)
 
+        # Messages are not compressed over a Unix socket by default.
+        self.assertEqual(client.socket.extensions, [])
+
+        await app.services.detail.setName("Mr. Handsome")
+        res = await app.services.detail.getName()
+        self.assertEqual(res, "Mr. Handsome")
+
+        await client.close()
+        await server.terminate()
+
+    async def connectWithCodec(self, codec: str):
+        # The binary codecs are optional dependencies.
+        if not getCodec(codec):
+            self.skipTest(f"codec {codec} is not installed")
+
+        _config = config.copy()
+        _config["codec"] = codec
+        server = await serve()
+        client = await app.connect(_config)
+        await client.register(app.services.detail)
+
+        self.assertEqual(client.codec, codec)
+
         await app.services.detail.setName("Mr. Handsome")
         res = await app.services.detail.getName()
         self.assertEqual(res, "Mr. Handsome")
 
+        data = {"id": 1, "scores": [1.5, 2, 3], "tags": {"a": None}}
+        self.assertEqual(await app.services.detail.setAndGet(data), data)
+
+        orgs = []
+
+        async for org in app.services.detail.getOrgs():
+            orgs.append(org)
+
+        self.assertListEqual(orgs, ["Mozilla", "GitHub", "Linux"])
+
+        await client.close()
+        await server.terminate()
+
+    async def test_serving_and_connecting_rpc_with_msgpack(self):
+        await self.connectWithCodec("MSGPACK")
+
+    async def test_serving_and_connecting_rpc_with_cbor(self):
+        await self.connectWithCodec("CBOR")
+
+    async def test_packing_messages_sent_in_the_same_tick(self):
+        server = await serve()
+        client = await app.connect(config)
+        await client.register(app.services.detail)
+
+        frames = 0
+        send = client.socket.send
+
+        async def countingSend(msg):
+            nonlocal frames
+            frames += 1
+            await send(msg)
+
+        client.socket.send = countingSend
+        calls = [app.services.detail.setAndGet(i) for i in range(10)]
+        results = await asyncio.gather(*calls)
+
+        self.assertListEqual(results, list(range(10)))
+        self.assertEqual(frames, 1)
+
+        await client.close()
+        await server.terminate()
+
+    async def test_limiting_inflight_requests_of_client(self):
+        server = await serve({"USE_OPTIONS": {"maxInflight": 1}})
+        client = await app.connect(config)
+        await client.register(app.services.detail)
+
+        start = asyncio.get_event_loop().time()
+        results = await asyncio.gather(app.services.detail.wait(0.2),
+                                       app.services.detail.wait(0.2))
+        duration = asyncio.get_event_loop().time() - start
+
+        self.assertListEqual(results, [0.2, 0.2])
+        self.assertGreaterEqual(duration, 0.4)
+
+        await client.close()
+        await server.terminate()
+
+    async def test_limiting_inflight_requests_of_server(self):
+        server = await serve({"USE_OPTIONS": {"maxInflightTotal": 1}})
+        client = await app.connect(config)
+        await client.register(app.services.detail)
+
+        start = asyncio.get_event_loop().time()
+        results = await asyncio.gather(app.services.detail.wait(0.2),
+                                       app.services.detail.wait(0.2))
+        duration = asyncio.get_event_loop().time() - start
+
+        self.assertListEqual(results, [0.2, 0.2])
+        self.assertGreaterEqual(duration, 0.4)
+
+        await client.close()
+        await server.terminate()
+
+    async def test_rejecting_requests_when_overloaded(self):
+        server = await serve({"USE_OPTIONS": {
+            "maxInflight": 1,
+            "overloadPolicy": "reject"
+        }})
+        client = await app.connect(config)
+        await client.register(app.services.detail)
+
+        results = await asyncio.gather(app.services.detail.wait(0.2),
+                                       app.services.detail.getName(),
+                                       return_exceptions=True)
+
+        self.assertEqual(results[0], 0.2)
+        self.assertTrue(isinstance(results[1], OverloadError))
+        self.assertEqual(await app.services.detail.getName(), "Mr. World")
+
+        await client.close()
+        await server.terminate()
+
+    async def test_spreading_calls_across_connections(self):
+        _config = config.copy()
+        _config["connections"] = 3
+        server = await serve()
+        client = await app.connect(_config)
+        await client.register(app.services.detail)
+
+        sent = []
+        received = []
+
+        for conn in range(3):
+            socket = client._RpcClient__outboxes[conn].socket
+            send = socket.send
+            recv = socket.recv
+
+            async def countingSend(msg, conn=conn, send=send):
+                sent.append((conn, msg))
+                await send(msg)
+
+            async def countingRecv(conn=conn, recv=recv):
+                msg = await recv()
+                received.append((conn, msg))
+                return msg
+
+            socket.send = countingSend
+            socket.recv = countingRecv
+
+        results = await asyncio.gather(*[
+            app.services.detail.wait(0.1) for _ in range(3)
+        ])
+        self.assertListEqual(results, [0.1, 0.1, 0.1])
+        self.assertSetEqual(set(conn for (conn, _) in sent), {0, 1, 2})
+
+        # The values of a generator are all pulled via its own connection.
+        values = []
+        sent.clear()
+        received.clear()
+
+        async for value in app.services.detail.getOrgs():
+            values.append(value)
+
+        self.assertListEqual(values, ["Mozilla", "GitHub", "Linux"])
+
+        def getEvents(frames: list) -> list:
+            events = []
+
+            for (_, msg) in frames:
+                res = getCodec("JSON").decode(msg)
+                events.extend(_res[0] for _res in  # batch frame or not
+                              (res if type(res[0]) == list else [res]))
+
+            return events
+
+        # Both the requests and the responses of the generator go through
+        # one connection.
+        conns = set(conn for (conn, _) in sent + received)
+        self.assertEqual(len(conns), 1)
+        self.assertIn(ChannelEvents.YIELD, getEvents(sent))
+        self.assertIn(ChannelEvents.YIELD, getEvents(received))
+
+        await client.close()
+        await server.terminate()
+
+    # Multiple workers are not supported on Windows, and SO_REUSEPORT on
+    # macOS doesn't spread the connections across the workers.
+    @unittest.skipIf(sys.platform != "linux",
+                     "multiple workers are tested on Linux only")
+    async def test_serving_rpc_with_multiple_workers(self):
+        server = await serve({"USE_OPTIONS": {"workers": 2}})
+        _config = config.copy()
+        _config["connections"] = 16
+        client = await app.connect(_config)
+        await client.register(app.services.detail)
+
+        pids = await asyncio.gather(*[
+            app.services.detail.getPid() for _ in range(16)
+        ])
+
+        # The connections are distributed to both workers by the system.
+        self.assertEqual(len(set(pids)), 2)
+
+        await client.close()
+        await server.terminate()
+
+    async def test_running_method_in_process_pool(self):
+        server = await serve()
+        client = await app.connect(config)
+        await client.register(app.services.detail)
+
+        pid = await app.services.detail.getPid()
+        task = asyncio.ensure_future(
+            app.services.detail.getPidInProcess(0.3))
+        await asyncio.sleep(0.1)
+
+        # The event loop of the server is not blocked by the pool process.
+        self.assertFalse(task.done())
+        self.assertEqual(await app.services.detail.getPid(), pid)
+        self.assertFalse(task.done())
+        self.assertNotEqual(await task, pid)
+
+        await client.close()
+        await server.terminate()
+
+    async def test_running_methods_of_module_in_thread_pool(self):
+        server = await app.serve(config)
+        await server.register(app.services.detail, "thread")
+
+        # Use a client-only app so that the calls go through the server.
+        _app = ModuleProxyApp("tests.app", False)
+        client = await _app.connect(config)
+        await client.register(_app.services.detail)
+
+        self.assertNotEqual(await _app.services.detail.getThreadName(),
+                            threading.current_thread().name)
+        self.assertEqual(await _app.services.detail.getName(), "Mr. World")
+
+        stats = {item["method"]: item for item in server.getMethodStats()}
+        self.assertEqual(stats["getThreadName"]["executor"], "thread")
+        self.assertEqual(stats["getThreadName"]["calls"], 1)
+        self.assertEqual(stats["getThreadName"]["pending"], 0)
+        self.assertEqual(stats["getName"]["executor"], "loop")
+        self.assertEqual(server.getPoolStats()["thread"]["completed"], 1)
+
+        # The process pool is only started on the first call.
+        self.assertNotIn("process", server.getPoolStats())
+
+        await client.close()
+        await server.close()
+
+    async def test_dispatching_calls_after_registering_again(self):
+        server = await app.serve(config)
+        await server.register(app.services.detail)
+
+        _app = ModuleProxyApp("tests.app", False)
+        client = await _app.connect(config)
+        await client.register(_app.services.detail)
+
+        self.assertEqual(await _app.services.detail.getThreadName(),
+                         threading.current_thread().name)
+
+        # The methods are resolved again with the new policy.
+        await server.register(app.services.detail, "thread")
+        self.assertNotEqual(await _app.services.detail.getThreadName(),
+                            threading.current_thread().name)
+
+        await client.close()
+        await server.close()
+
+    async def test_caching_results_of_cacheable_method(self):
+        server = await serve()
+        client = await app.connect(config)
+        await client.register(app.services.detail)
+
+        a = await app.services.detail.countCalls("a")
+        self.assertEqual(await app.services.detail.countCalls("a"), a)
+        b = await app.services.detail.countCalls("b")
+        self.assertNotEqual(b, a)
+        self.assertEqual(client.getCacheStats(), [{
+            "module": "tests.app.services.detail",
+            "method": "countCalls",
+            "size": 2,
+            "hits": 1,
+            "misses": 2
+        }])
+
+        # The call reaches the server, where the result is memoized.
+        client.invalidateCache("tests.app.services.detail", "countCalls",
+                               ["a"])
+        self.assertEqual(await app.services.detail.countCalls("a"), a)
+        self.assertEqual(client.getCacheStats()[0]["misses"], 3)
+
+        # Modifying a result doesn't affect the cached one.
+        client.setCache("tests.app.services.detail", "setAndGet")
+        data = {"names": ["Mr. World"]}
+        res = await app.services.detail.setAndGet(data)
+        res["names"].append("Mr. Handsome")
+        res = await app.services.detail.setAndGet(data)
+        self.assertEqual(res, data)
+        res["names"].append("Mr. Handsome")
+        self.assertEqual(await app.services.detail.setAndGet(data), data)
+        self.assertEqual(client.getCacheStats()[1]["hits"], 2)
+
+        await client.close()
+        await server.terminate()
+
+    async def test_invalidating_cached_results_by_server(self):
+        server = await app.serve(config)
+        await server.register(app.services.detail)
+
+        _app = ModuleProxyApp("tests.app", False)
+        client = await _app.connect(config)
+        await client.register(_app.services.detail)
+        client.setCache("tests.app.services.detail", "countCalls")
+
+        a = await _app.services.detail.countCalls()
+        self.assertEqual(await _app.services.detail.countCalls(), a)
+
+        server.invalidateCache("tests.app.services.detail", "countCalls")
+        await asyncio.sleep(0.1)
+        self.assertNotEqual(await _app.services.detail.countCalls(), a)
+
+        await client.close()
+        await server.close()
+
+    async def test_memoizing_results_of_cacheable_method(self):
+        server = await app.serve(config)
+        await server.register(app.services.detail)
+
+        # The client-only app doesn't cache the results by itself.
+        _app = ModuleProxyApp("tests.app", False)
+        client = await _app.connect(config)
+        await client.register(_app.services.detail)
+
+        # The concurrent misses wait for the same call.
+        counts = await asyncio.gather(*[
+            _app.services.detail.countCalls("x") for _ in range(5)
+        ])
+        self.assertEqual(len(set(counts)), 1)
+        self.assertEqual(await _app.services.detail.countCalls("x"),
+                         counts[0])
+        self.assertEqual(server.getCacheStats(), [{
+            "module": "tests.app.services.detail",
+            "method": "countCalls",
+            "size": 1,
+            "hits": 1,
+            "misses": 5
+        }])
+
+        # The service invalidates the results once the data changes.
+        await _app.services.detail.resetCount()
+        self.assertEqual(await _app.services.detail.countCalls("x"), 1)
+
+        await client.close()
+        await server.close()
+
+    async def test_releasing_waiters_of_interrupted_call(self):
+        server = await app.serve(config)
+        await server.register(app.services.detail)
+        _app = ModuleProxyApp("tests.app", False)
+        client = await _app.connect(config)
+        await client.register(_app.services.detail)
+
+        async def interrupt(*args):
+            await asyncio.sleep(0.05)
+            raise asyncio.CancelledError()
+
+        server._RpcServer__invoke = interrupt
+        first = asyncio.ensure_future(_app.services.detail.countCalls("y"))
+        await asyncio.sleep(0.01)
+
+        # The identical call waiting for the first one is not left hanging.
+        with self.assertRaisesRegex(Exception, "interrupted"):
+            await asyncio.wait_for(_app.services.detail.countCalls("y"), 1)
+
+        first.cancel()
+        del server._RpcServer__invoke
+        self.assertIsInstance(await _app.services.detail.countCalls("y"), int)
+
+        await client.close()
+        await server.close()
+
+    async def test_coalescing_identical_calls_in_flight(self):
+        server = await serve()
+        _config = config.copy()
+        _config["coalesce"] = True
+        client = await app.connect(_config)
+        await client.register(app.services.detail)
+
+        results = await asyncio.gather(*[
+            app.services.detail.wait(0.1) for _ in range(5)
+        ], app.services.detail.wait(0.2))
+        self.assertEqual(results, [0.1] * 5 + [0.2])
+        self.assertEqual(client.coalesced, 4)
+        self.assertEqual(len(client.inflight), 0)
+
+        # Each caller gets its own copy of the result.
+        results = await asyncio.gather(*[
+            app.services.detail.setAndGet({"list": [1]}) for _ in range(3)
+        ])
+        self.assertEqual(client.coalesced, 6)
+        results[0]["list"].append(2)
+        self.assertEqual(results[1], {"list": [1]})
+        self.assertEqual(results[2], {"list": [1]})
+        self.assertIsNot(results[1], results[2])
+
+        # Calls of generators, and of plain functions which may return one,
+        # are never coalesced.
+        async def collect(gen):
+            return [org async for org in gen]
+
+        orgs = await asyncio.gather(
+            *[collect(app.services.detail.getOrgs()) for _ in range(2)],
+            *[collect(app.services.detail.getOrgsLazily()) for _ in range(2)])
+        self.assertEqual(orgs, [["Mozilla", "GitHub", "Linux"]] * 4)
+        self.assertEqual(client.coalesced, 6)
+
+        await client.close()
+        await server.terminate()
+
+    async def test_compressing_messages_above_threshold(self):
+        server = await serve({"USE_OPTIONS": {"compressionThreshold": 100}})
+        _config = config.copy()
+        _config["compressionLevel"] = 1
+        client = await app.connect(_config)
+        await client.register(app.services.detail)
+
+        [ext] = client.socket.extensions
+        self.assertIsInstance(ext, ThresholdDeflate)
+        self.assertEqual(ext.threshold, 1024)
+
+        data = {"items": ["Mr. World"] * 1000}
+        self.assertEqual(await app.services.detail.setAndGet(data), data)
+
+        await client.close()
+        await server.terminate()
+
+    async def test_disabling_compression(self):
+        server = await serve()
+        _config = config.copy()
+        _config["compression"] = False
+        client = await app.connect(_config)
+        await client.register(app.services.detail)
+
+        self.assertEqual(client.socket.extensions, [])
+        self.assertEqual(await app.services.detail.getName(), "Mr. World")
+
+        await client.close()
+        await server.terminate()
+
+    async def test_sending_binary_data_as_frames(self):
+        server = await serve()
+        client = await app.connect(config)
+        await client.register(app.services.detail)
+
+        image = os.urandom(100000)
+        thumbs = [bytearray(b"abc"), memoryview(b"xyz")]
+        data = {"image": image, "thumbs": thumbs}
+        self.assertEqual(await app.services.detail.setAndGet(data),
+                         {"image": image, "thumbs": [b"abc", b"xyz"]})
+        self.assertEqual(await app.services.detail.setAndGet([image, 1]),
+                         [image, 1])
+
+        # The server closes the connection if the peer declares too many
+        # binary frames.
+        socket = client.socket
+        await socket.send(getCodec("JSON").encode([
+            ChannelEvents.BINARY, 100000, [ChannelEvents.INVOKE, 1, "", "", []]
+        ]))
+        await socket.wait_closed()
+        self.assertEqual(socket.close_code, 1002)
+
+        await client.close()
+        await server.terminate()
+
+    async def test_measuring_latency_of_server(self):
+        _config = config.copy()
+        _config["pingInterval"] = 50
+        server = await serve()
+        client = await app.connect(_config)
+        await client.register(app.services.detail)
+
+        await asyncio.sleep(0.2)
+        self.assertIsNotNone(client.rtt)
+        self.assertLess(client.rtt, 50)
+        self.assertIsNone(client.latency)
+
+        await app.services.detail.wait(0.1)
+        self.assertGreater(client.latency, 90)
+
+        await client.close()
+        await server.terminate()
+
+    async def test_prefetching_values_from_remote_generator(self):
+        _config = config.copy()
+        _config["prefetch"] = 4
+        server = await serve()
+        client = await app.connect(_config)
+        await client.register(app.services.detail)
+        self.assertTrue(client.hasFeature("pull"))
+
+        frames = 0
+        send = client.socket.send
+
+        async def countingSend(msg):
+            nonlocal frames
+            frames += 1
+            await send(msg)
+
+        client.socket.send = countingSend
+        result = []
+
+        async for value in app.services.detail.getNumbers(10):
+            result.append(value)
+
+        self.assertListEqual(result, list(range(10)))
+        self.assertLess(frames, 10)
+
+        gen = app.services.detail.getNumbers(10)
+        self.assertEqual(await gen.__anext__(), 0)
+        err: Exception = None
+
+        try:
+            await gen.asend(1)
+        except Exception as e:
+            err = e
+        self.assertTrue(isinstance(err, RuntimeError))
+        self.assertTrue(isinstance(err, RuntimeError))
+        await gen.aclose()
+
+        # A generator driven by `asend()` is never pulled ahead.
+        gen = app.services.detail.repeatAfterMe()
+        self.assertIsNone(await gen.asend(None))
+        self.assertEqual(await gen.asend("Google"), "Google")
+        self.assertEqual(await gen.asend("Apple"), "Apple")
+
+        with self.assertRaises(StopAsyncIteration):
+            await gen.asend("break")
+
+        await client.close()
+        await server.terminate()
+
+    async def test_pulling_values_without_pull_feature(self):
+        _config = config.copy()
+        _config["prefetch"] = 4
+
+        # Pretend that the server is an older version.
+        Features.remove("pull")
+
+        try:
+            server = await serve()
+        finally:
+            Features.append("pull")
+
+        client = await app.connect(_config)
+        await client.register(app.services.detail)
+
+        self.assertFalse(client.hasFeature("pull"))
+
+        events = []
+        send = client.send
+
+        def recordingSend(event, *args, **kwargs):
+            events.append(event)
+            send(event, *args, **kwargs)
+
+        client.send = recordingSend
+        result = []
+
+        async for value in app.services.detail.getNumbers(5):
+            result.append(value)
+
+        self.assertListEqual(result, list(range(5)))
+        self.assertNotIn(ChannelEvents.PULL, events)
+        self.assertIn(ChannelEvents.YIELD, events)
+
         await client.close()
         await server.terminate()
 
@@ -71,6 +649,30 @@ class RemoteInstanceTest(AioTestCase, RpcCommonTest):
         delattr(app.services.detail.__ctor__, "init")
         delattr(app.services.detail.__ctor__, "destroy")
 
+    async def test_rejecting_calls_of_destroyed_instance(self):
+        server = await app.serve(config)
+        await server.register(app.services.detail)
+
+        # Use a client-only app so that the calls go through the server.
+        _app = ModuleProxyApp("tests.app", False)
+        client = await _app.connect(config)
+        await client.register(_app.services.detail)
+
+        self.assertEqual(await _app.services.detail.getName(), "Mr. World")
+
+        # The handler resolved before is no longer used once the instance is
+        # destroyed.
+        await tryLifeCycleFunction(app.services.detail, "destroy", None)
+
+        with self.assertRaises(ReferenceError):
+            await _app.services.detail.getName()
+
+        await tryLifeCycleFunction(app.services.detail, "init", None)
+        self.assertEqual(await _app.services.detail.getName(), "Mr. World")
+
+        await client.close()
+        await server.close()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -37,6 +37,10 @@ async def __serve(state: dict, env: dict):
         __config = _config.copy()
         __config["secret"] = env.get("USE_SECRET")
         server = await app.serve(__config)
+    elif env.get("USE_OPTIONS"):
+        __config = _config.copy()
+        __config.update(env.get("USE_OPTIONS"))
+        server = await app.serve(__config)
     elif env.get("USE_WSS"):
         __config = _config.copy()
         __config["protocol"] = "wss:"
@@ -0,0 +1,568 @@
+import unittest
+from microse.utils import Map, evalRouteId, rendezvousScore
+from microse.app import ModuleProxyApp
+from microse.routing import RoutingTable, getRoutingTable
+from microse.rpc.binary import MaxBinaryFrames, checkEnvelope, encodeMessage, isEnvelope, openEnvelope
+from microse.rpc.cache import ResultCache, decodeResult, encodeResult
+from microse.rpc.codec import codecs, getCodec
+from microse.rpc.compression import ThresholdDeflate
+from microse.rpc.outbox import Outbox
+from microse.rpc.timer import TimerWheel
+from microse.rpc.executor import Pool, resolveExecutor, runInProcess, runInThread
+from concurrent.futures import ThreadPoolExecutor
+from websockets.extensions.permessage_deflate import PerMessageDeflate
+from websockets.frames import OP_TEXT, Frame
+from tests.aio import AioTestCase
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+
+class MapTest(unittest.TestCase):
+    def test_setting_and_getting_values(self):
+        _map = Map([("foo", 1), ("bar", 2)])
+
+        self.assertEqual(_map.size, 2)
+        self.assertEqual(_map.get("foo"), 1)
+        self.assertEqual(_map.get("bar"), 2)
+        self.assertEqual(_map.get("baz"), None)
+        self.assertTrue(_map.has("foo"))
+        self.assertFalse(_map.has("baz"))
+
+    def test_overwriting_existing_key(self):
+        _map = Map([("foo", 1), ("bar", 2)])
+        _map.set("foo", 3)
+
+        self.assertEqual(_map.size, 2)
+        self.assertEqual(_map.get("foo"), 3)
+        self.assertListEqual(list(_map), [("foo", 3), ("bar", 2)])
+
+    def test_deleting_and_clearing_keys(self):
+        _map = Map([("foo", 1), ("bar", 2)])
+
+        self.assertTrue(_map.delete("foo"))
+        self.assertFalse(_map.delete("foo"))
+        self.assertEqual(_map.size, 1)
+
+        _map.clear()
+        self.assertEqual(_map.size, 0)
+
+    def test_using_objects_as_keys(self):
+        key1 = object()
+        key2 = object()
+        _map = Map([(key1, "foo"), (key2, "bar")])
+
+        self.assertEqual(_map.get(key1), "foo")
+        self.assertEqual(_map.get(key2), "bar")
+
+    def test_modifying_during_iteration(self):
+        _map = Map([(1, "foo"), (2, "bar"), (3, "baz")])
+
+        for key in _map.keys():
+            _map.delete(key)
+
+        self.assertEqual(_map.size, 0)
+
+        _map = Map([(1, "foo"), (2, "bar")])
+
+        for (key, value) in _map:
+            _map.set(key + 2, value)
+
+        self.assertListEqual(list(_map.values()), ["foo", "bar", "foo", "bar"])
+
+
+class RouteTest(unittest.TestCase):
+    def test_evaluating_route_id_across_processes(self):
+        routes = ["David", {"id": 1, "name": "David"}, ["a", "b"], 3, 2.5]
+        script = "from microse.utils import evalRouteId; " + \
+            f"print([evalRouteId(route) for route in {routes!r}])"
+        expected = str([evalRouteId(route) for route in routes])
+
+        for seed in ["1", "2"]:
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            output = subprocess.check_output([sys.executable, "-c", script],
+                                             env=env, text=True)
+            self.assertEqual(output.strip(), expected)
+
+    def test_remapping_routes_when_removing_servers(self):
+        servers = [f"ws://localhost:{4000 + i}" for i in range(5)]
+
+        def select(routeId: int, servers: list):
+            return max(servers, key=lambda key: rendezvousScore(routeId, key))
+
+        routes = [evalRouteId(f"user-{i}") for i in range(1000)]
+        before = {route: select(route, servers) for route in routes}
+        after = {route: select(route, servers[1:]) for route in routes}
+        counts = {server: 0 for server in servers}
+
+        for route in routes:
+            counts[before[route]] += 1
+
+            # Only the routes of the removed server are moved.
+            if before[route] != servers[0]:
+                self.assertEqual(after[route], before[route])
+
+        for count in counts.values():
+            self.assertGreater(count, 100)
+
+
+class Client:
+    def __init__(self, outstanding=0, weight=1, rtt=None, latency=None):
+        self.tasks = Map([(i, None) for i in range(outstanding)])
+        self.weight = weight
+        self.rtt = rtt
+        self.latency = latency
+
+
+class Instance:
+    def __init__(self, serverId: str, readyState=1, client: Client = None):
+        self.serverId = serverId
+        self.client = client or Client()
+        setattr(self, "__readyState", readyState)
+
+
+class RoutingTableTest(unittest.TestCase):
+    def test_updating_instances_by_ready_state(self):
+        table = RoutingTable()
+        ins1 = Instance("server-1")
+        ins2 = Instance("server-2", 0)
+        table.update("server-1", ins1)
+        table.update("server-2", ins2)
+
+        self.assertEqual(table.size, 1)
+        self.assertEqual(table.select("David"), ins1)
+
+        setattr(ins2, "__readyState", 1)
+        table.update("server-2", ins2)
+        self.assertEqual(table.size, 2)
+
+        setattr(ins1, "__readyState", 0)
+        table.update("server-1", ins1)
+        self.assertEqual(table.size, 1)
+        self.assertEqual(table.select("David"), ins2)
+
+        table.update("server-2", None)
+        self.assertEqual(table.size, 0)
+        self.assertEqual(table.select("David"), None)
+
+    def test_selecting_instances_consistently(self):
+        servers = [f"server-{i}" for i in range(5)]
+        routes = [f"user-{i}" for i in range(1000)]
+        table = RoutingTable()
+        other = RoutingTable()
+
+        for serverId in servers:
+            table.add(serverId, Instance(serverId))
+
+        for serverId in reversed(servers):
+            other.add(serverId, Instance(serverId))
+
+        before = {route: table.select(route).serverId for route in routes}
+        counts = {serverId: 0 for serverId in servers}
+
+        for route in routes:
+            # The selection doesn't depend on the order of joining.
+            self.assertEqual(other.select(route).serverId, before[route])
+            counts[before[route]] += 1
+
+        for count in counts.values():
+            self.assertGreater(count, 100)
+
+        table.remove("server-0")
+
+        for route in routes:
+            # Only the routes of the removed server are moved.
+            if before[route] != "server-0":
+                self.assertEqual(table.select(route).serverId, before[route])
+            else:
+                self.assertNotEqual(table.select(route).serverId, "server-0")
+
+    def test_selecting_least_outstanding_instance(self):
+        table = RoutingTable("least-outstanding")
+
+        for (i, outstanding) in enumerate([3, 1, 2]):
+            table.add(f"server-{i}", Instance(f"server-{i}",
+                                              client=Client(outstanding)))
+
+        self.assertEqual(table.select("").serverId, "server-1")
+        self.assertEqual(table.select("David").serverId, "server-1")
+
+    def test_selecting_instance_of_power_of_two_choices(self):
+        table = RoutingTable("power-of-two")
+        table.add("server-0", Instance("server-0", client=Client(5)))
+        table.add("server-1", Instance("server-1", client=Client(1)))
+
+        for _ in range(10):
+            self.assertEqual(table.select("").serverId, "server-1")
+
+        table.add("server-2", Instance("server-2", client=Client(9)))
+        selected = set(table.select("").serverId for _ in range(100))
+
+        # The busiest instance is never picked among three.
+        self.assertNotIn("server-2", selected)
+
+    def test_selecting_instances_by_weighted_round_robin(self):
+        table = RoutingTable("round-robin")
+        table.add("server-0", Instance("server-0", client=Client(weight=3)))
+        table.add("server-1", Instance("server-1", client=Client(weight=1)))
+        selected = [table.select("").serverId for _ in range(8)]
+
+        self.assertEqual(selected.count("server-0"), 6)
+        self.assertEqual(selected.count("server-1"), 2)
+        self.assertNotEqual(selected[0:3], ["server-0"] * 3)
+
+    def test_selecting_fastest_instance(self):
+        table = RoutingTable("latency")
+        table.add("server-0", Instance("server-0", client=Client(rtt=30)))
+        table.add("server-1", Instance("server-1", client=Client(rtt=2)))
+        table.add("server-2", Instance("server-2", client=Client(rtt=5)))
+
+        self.assertEqual(table.select("").serverId, "server-1")
+
+        # The call latency takes precedence over the ping RTT.
+        table.get("server-1").client.latency = 40
+        self.assertEqual(table.select("").serverId, "server-2")
+
+        # The latency is scaled by the outstanding calls.
+        table.get("server-2").client = Client(outstanding=9, rtt=5)
+        self.assertEqual(table.select("").serverId, "server-0")
+
+    def test_setting_balancer_of_app_and_module(self):
+        app = ModuleProxyApp("tests.app", False)
+        detail = getRoutingTable(app, "tests.app.services.detail")
+
+        app.setBalancer("least-outstanding")
+        self.assertEqual(detail.balancer.name, "least-outstanding")
+
+        app.setBalancer("round-robin", app.services.detail)
+        app.setBalancer("power-of-two")
+        self.assertEqual(detail.balancer.name, "round-robin")
+        self.assertEqual(getRoutingTable(app, "tests.app.services.user")
+                         .balancer.name, "power-of-two")
+
+        self.assertRaises(ValueError, app.setBalancer, "unknown")
+
+
+class CodecTest(unittest.TestCase):
+    def test_encoding_and_decoding_messages(self):
+        data = [2, 1, {"name": "Mr. World", "scores": [1.5, 2, None]}]
+
+        for codec in codecs.values():
+            self.assertEqual(codec.decode(codec.encode(data)), data)
+
+    def test_joining_encoded_messages(self):
+        for codec in codecs.values():
+            for count in [1, 15, 16, 24, 256, 65536]:
+                msgs = [[2, i, "hello"] for i in range(count)]
+                batch = codec.join([codec.encode(msg) for msg in msgs])
+                self.assertEqual(codec.decode(batch), msgs)
+
+
+class BinaryTest(unittest.TestCase):
+    def test_sending_binary_data_as_frames(self):
+        data = {"image": b"\x89PNG", "parts": [bytearray(b"abc"),
+                                               memoryview(b"abcdef")[::2]]}
+
+        for codec in codecs.values():
+            (msg, buffers) = encodeMessage(codec, [3, 1, data], True)
+            envelope = codec.decode(msg)
+            self.assertTrue(isEnvelope(envelope))
+            self.assertEqual(envelope[1], 3)
+            frames = [bytes(buf) for buf in buffers]
+            self.assertEqual(frames, [b"\x89PNG", b"abc", b"ace"])
+            self.assertEqual(openEnvelope(envelope, frames), [3, 1, {
+                "image": b"\x89PNG",
+                "parts": [b"abc", b"ace"]
+            }])
+
+            # Messages without binary data are left as is.
+            (msg, buffers) = encodeMessage(codec, [3, 1, "hello"], True)
+            self.assertEqual(codec.decode(msg), [3, 1, "hello"])
+            self.assertEqual(buffers, [])
+
+            # Dicts that look like placeholders are escaped.
+            escaped = [b"abc", {"$binary": 0}, {"$binary": {"$binary": 1}}]
+            (msg, buffers) = encodeMessage(codec, [3, 1, escaped], True)
+            envelope = codec.decode(msg)
+            frames = [bytes(buf) for buf in buffers]
+            self.assertEqual(openEnvelope(envelope, frames), [3, 1, escaped])
+
+    def test_checking_number_of_binary_frames(self):
+        checkEnvelope([12, 1, [3, 1, {"$binary": 0}]])
+
+        for count in [0, -1, MaxBinaryFrames + 1]:
+            with self.assertRaises(ValueError):
+                checkEnvelope([12, count, [3, 1, {"$binary": 0}]])
+
+        # A placeholder refers to a missing frame.
+        with self.assertRaises(ValueError):
+            openEnvelope([12, 1, [3, 1, {"$binary": 1}]], [b"abc"])
+
+
+class SlowSocket:
+    """
+    A fake socket that doesn't send anything until it's ready.
+    """
+
+    def __init__(self):
+        self.open = True
+        self.ready = asyncio.Event()
+        self.sent = []
+
+    async def send(self, msg):
+        await self.ready.wait()
+        self.sent.append(msg)
+
+    async def close(self, code=1000, reason=""):
+        self.open = False
+
+
+class OutboxTest(AioTestCase):
+    async def test_packing_messages_into_batch_frame(self):
+        socket = SlowSocket()
+        socket.ready.set()
+        codec = getCodec("JSON")
+        outbox = Outbox(socket, codec, batch=True)
+
+        for i in range(3):
+            outbox.push(codec.encode([2, i, "hello"]))
+
+        while outbox.queue:
+            await asyncio.sleep(0.01)
+
+        self.assertEqual(len(socket.sent), 1)
+        self.assertEqual(codec.decode(socket.sent[0]),
+                         [[2, 0, "hello"], [2, 1, "hello"], [2, 2, "hello"]])
+
+        outbox.close()
+
+    async def test_sending_binary_frames_after_envelope(self):
+        socket = SlowSocket()
+        socket.ready.set()
+        codec = getCodec("JSON")
+        outbox = Outbox(socket, codec, batch=True, binary=True)
+
+        outbox.push(codec.encode([2, 0, "hello"]))
+        (msg, buffers) = encodeMessage(codec, [2, 1, b"world"], True)
+        outbox.push(msg, buffers=buffers)
+        outbox.push(codec.encode([2, 2, "hello"]))
+        outbox.push(codec.encode([2, 3, "hello"]))
+
+        while outbox.size:
+            await asyncio.sleep(0.01)
+
+        self.assertEqual(len(socket.sent), 4)
+        self.assertEqual(codec.decode(socket.sent[0]), [2, 0, "hello"])
+        self.assertTrue(isEnvelope(codec.decode(socket.sent[1])))
+        self.assertEqual(socket.sent[2], b"world")
+        self.assertEqual(codec.decode(socket.sent[3]),
+                         [[2, 2, "hello"], [2, 3, "hello"]])
+
+        outbox.close()
+
+    async def test_pausing_and_draining_when_overflowed(self):
+        socket = SlowSocket()
+        outbox = Outbox(socket, getCodec("JSON"), highWaterMark=10,
+                        lowWaterMark=5, policy="pause")
+
+        outbox.push("[2,1,1]")
+        self.assertFalse(outbox.overflowed)
+        outbox.push("[2,2,2]")
+        self.assertTrue(outbox.overflowed)
+
+        drain = asyncio.create_task(outbox.drain())
+        await asyncio.sleep(0.01)
+        self.assertFalse(drain.done())
+
+        socket.ready.set()
+        await drain
+
+        self.assertFalse(outbox.overflowed)
+        self.assertEqual(outbox.size, 0)
+        self.assertEqual(len(socket.sent), 2)
+
+        outbox.close()
+
+    async def test_dropping_messages_when_overflowed(self):
+        socket = SlowSocket()
+        outbox = Outbox(socket, getCodec("JSON"), highWaterMark=10,
+                        lowWaterMark=5, policy="drop")
+
+        outbox.push("[6,\"a\",1]", droppable=True)
+        outbox.push("[6,\"a\",2]", droppable=True)
+        self.assertTrue(outbox.overflowed)
+        self.assertFalse(outbox.push("[6,\"a\",3]", droppable=True))
+        self.assertTrue(outbox.push("[2,1,1]"))
+        self.assertEqual(outbox.dropped, 1)
+        self.assertEqual(len(outbox.queue), 3)
+
+        socket.ready.set()
+        outbox.close()
+
+    async def test_closing_connection_when_overflowed(self):
+        socket = SlowSocket()
+        outbox = Outbox(socket, getCodec("JSON"), highWaterMark=10,
+                        lowWaterMark=5, policy="close")
+
+        outbox.push("[2,1,1]")
+        outbox.push("[2,2,2]")
+        await asyncio.sleep(0.01)
+
+        self.assertTrue(outbox.closed)
+        self.assertFalse(socket.open)
+        self.assertFalse(outbox.push("[2,3,3]"))
+
+        socket.ready.set()
+
+
+class TimerWheelTest(AioTestCase):
+    async def test_expiring_callbacks_of_the_same_tick(self):
+        timers = TimerWheel(resolution=20)
+        expired = []
+
+        for i in range(5):
+            timers.add(30, lambda i=i: expired.append(i))
+
+        self.assertEqual(len(timers), 5)
+        self.assertLessEqual(len(timers.buckets), 2)
+
+        await asyncio.sleep(0.02)
+        self.assertEqual(expired, [])
+
+        await asyncio.sleep(0.05)
+        self.assertEqual(expired, [0, 1, 2, 3, 4])
+        self.assertEqual(len(timers), 0)
+        self.assertEqual(timers.buckets, {})
+
+    async def test_canceling_callbacks(self):
+        timers = TimerWheel(resolution=20)
+        expired = []
+        first = timers.add(20, lambda: expired.append(1))
+        timers.add(60, lambda: expired.append(2))
+
+        self.assertTrue(timers.cancel(first))
+        self.assertFalse(timers.cancel(first))
+        self.assertEqual(len(timers), 1)
+
+        await asyncio.sleep(0.1)
+        self.assertEqual(expired, [2])
+
+    async def test_scheduling_earlier_tick_later(self):
+        timers = TimerWheel(resolution=10)
+        expired = []
+        timers.add(100, lambda: expired.append(2))
+        timers.add(20, lambda: expired.append(1))
+
+        await asyncio.sleep(0.06)
+        self.assertEqual(expired, [1])
+
+        await asyncio.sleep(0.08)
+        self.assertEqual(expired, [1, 2])
+
+
+class CompressionTest(unittest.TestCase):
+    def test_compressing_messages_above_threshold(self):
+        sender = ThresholdDeflate(PerMessageDeflate(False, False, 15, 15), 100)
+        receiver = PerMessageDeflate(False, False, 15, 15)
+        small = Frame(OP_TEXT, b"small")
+        large = Frame(OP_TEXT, b"large" * 100)
+
+        for frame in [large, small, large]:
+            encoded = sender.encode(frame)
+            self.assertEqual(encoded.rsv1, frame is large)
+            self.assertEqual(receiver.decode(encoded).data, frame.data)
+
+        # The second large message is compressed with the shared window.
+        self.assertLess(len(sender.encode(large).data), 20)
+
+
+class ExecutorTest(unittest.TestCase):
+    def test_resolving_executors_of_methods(self):
+        def plain():
+            pass
+
+        async def coroutine():
+            pass
+
+        async def generator():
+            yield None
+
+        self.assertEqual(resolveExecutor(plain), "loop")
+        self.assertEqual(resolveExecutor(plain, "thread"), "thread")
+        self.assertEqual(resolveExecutor(coroutine, "thread"), "loop")
+        self.assertEqual(resolveExecutor(generator, "process"), "loop")
+        self.assertEqual(resolveExecutor(runInThread(plain)), "thread")
+        self.assertEqual(resolveExecutor(runInThread(coroutine)), "loop")
+        self.assertEqual(resolveExecutor(runInProcess(coroutine)), "process")
+
+
+class ResultCacheTest(unittest.TestCase):
+    def test_evicting_expired_and_least_recently_used_results(self):
+        cache = ResultCache(ttl=50, maxEntries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), (True, 1))
+
+        # "b" is the least recently used one.
+        cache.set("c", 3)
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.get("c"), (True, 3))
+
+        time.sleep(0.06)
+        self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.getStats(), {"size": 1, "hits": 2, "misses": 2})
+
+    def test_decoding_copies_of_cached_result(self):
+        for codec in codecs.values():
+            value = {"list": [1, 2], "data": b"\x00\x01", "$binary": 0}
+            entry = encodeResult(codec, value)
+            res1 = decodeResult(codec, entry)
+            res2 = decodeResult(codec, entry)
+
+            self.assertEqual(res1, value)
+            self.assertEqual(res2, value)
+
+            res1["list"].append(3)
+            self.assertListEqual(res2["list"], [1, 2])
+            self.assertListEqual(decodeResult(codec, entry)["list"], [1, 2])
+
+
+class PoolTest(AioTestCase):
+    async def test_counting_queued_calls(self):
+        pool = Pool(ThreadPoolExecutor(1), 1)
+        calls = [asyncio.ensure_future(pool.run(time.sleep, 0.05))
+                 for _ in range(3)]
+        await asyncio.sleep(0.01)
+
+        self.assertDictEqual(pool.getStats(), {
+            "size": 1,
+            "pending": 3,
+            "queued": 2,
+            "completed": 0
+        })
+
+        await asyncio.gather(*calls)
+        self.assertEqual(pool.pending, 0)
+        self.assertEqual(pool.queued, 0)
+        self.assertEqual(pool.completed, 3)
+
+        pool.shutdown()
+
+    async def test_cancelling_queued_calls_when_shutting_down(self):
+        pool = Pool(ThreadPoolExecutor(1), 1)
+        calls = [asyncio.ensure_future(pool.run(time.sleep, 0.05))
+                 for _ in range(3)]
+        await asyncio.sleep(0.01)
+
+        pool.shutdown(wait=True)
+        results = await asyncio.gather(*calls, return_exceptions=True)
+
+        self.assertIsNone(results[0])
+        self.assertTrue(all(isinstance(res, asyncio.CancelledError)
+                            for res in results[1:]))
+
+
+if __name__ == "__main__":
+    unittest.main()